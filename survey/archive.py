@@ -0,0 +1,88 @@
+import os
+import tarfile
+import threading
+import zipfile
+
+
+# opened archives, maps the absolute path to the ZipFile or TarFile instance,
+# so the index of an archive is read only once
+_archives = {}
+_lock = threading.Lock()
+
+
+def is_archive(path):
+    """Check if a file is a zip or tar archive."""
+    return os.path.isfile(path) and (zipfile.is_zipfile(path) or
+                                     tarfile.is_tarfile(path))
+
+
+def open_archive(path):
+    """Open an archive or get the already opened one."""
+    path = os.path.abspath(path)
+    if path not in _archives:
+        if zipfile.is_zipfile(path):
+            _archives[path] = zipfile.ZipFile(path)
+        else:
+            _archives[path] = tarfile.open(path)
+    return _archives[path]
+
+
+class ArchiveMember(object):
+    """An image in a zip or tar archive.
+
+    The member is read from the archive whenever the image is opened, so the
+    archive is never extracted and the images are not kept in memory.
+
+    Attributes
+    ----------
+    path : str
+        The filename of the archive.
+    member : str
+        The name of the image in the archive.
+    """
+    __slots__ = ("path", "member")
+
+    def __init__(self, path, member):
+        self.path = path
+        self.member = member
+
+    def read(self):
+        """Read the content of the image file.
+
+        Returns
+        -------
+        bytes
+            The content of the file, e.g. the jpg.
+        """
+        with _lock:
+            archive = open_archive(self.path)
+            if isinstance(archive, zipfile.ZipFile):
+                return archive.read(self.member)
+            return archive.extractfile(self.member).read()
+
+
+def archive_sources(path):
+    """Collect the images (jpg) of an archive.
+
+    Parameters
+    ----------
+    path : str
+        The filename of the zip or tar archive.
+
+    Returns
+    -------
+    list
+        A list of tuples of the name "archive:member" and the ArchiveMember
+        instance of each image, sorted by the name of the member.
+    """
+    with _lock:
+        archive = open_archive(path)
+        if isinstance(archive, zipfile.ZipFile):
+            members = [info.filename for info in archive.infolist()
+                       if not info.is_dir()]
+        else:
+            members = [info.name for info in archive.getmembers()
+                       if info.isfile()]
+
+    return [("{}:{}".format(path, m), ArchiveMember(path, m))
+            for m in sorted(members) if m.endswith("jpg")]
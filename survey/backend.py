@@ -0,0 +1,462 @@
+from __future__ import division
+
+import io
+import math
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from .archive import ArchiveMember
+
+
+# width of an A4 page in inch
+A4_WIDTH = 210 / 25.4
+
+# the current backend, see get_backend
+_backend = None
+
+
+def reduced_size(size, dpi, scan_dpi=None, stored_dpi=None):
+    """Get the size of an image at the working resolution.
+
+    Parameters
+    ----------
+    size : tuple
+        The width and the height of the image.
+    dpi : int
+        The working resolution.
+    scan_dpi : int or str, optional
+        The resolution of the scan. "auto" derives it from the width of an A4
+        page. Defaults to stored_dpi.
+    stored_dpi : float, optional
+        The resolution stored in the image file. Defaults to dpi.
+
+    Returns
+    -------
+    tuple
+        The width and the height or None if the resolution is not higher.
+    """
+    if scan_dpi is None:
+        scan_dpi = dpi if stored_dpi is None else stored_dpi
+    elif scan_dpi == "auto":
+        scan_dpi = size[0] / A4_WIDTH
+
+    if scan_dpi <= 1.05*dpi:
+        return None
+
+    return tuple(int(round(n*dpi/scan_dpi)) for n in size)
+
+
+def image_dpi(img):
+    """Get the resolution stored in an Image instance or None."""
+    return img.info.get("dpi", (None,))[0]
+
+
+def reduce_image(img, dpi, scan_dpi=None):
+    """Reduce an image to the working resolution.
+
+    JPEG images are already reduced by a power of two while decoding (draft
+    mode), so high resolution scans are never decoded completely.
+
+    Parameters
+    ----------
+    img : object
+        The Image instance, which was not loaded yet.
+    dpi, scan_dpi : optional
+        The working resolution and the resolution of the scan, see
+        `reduced_size`.
+
+    Returns
+    -------
+    object
+        The reduced Image instance or img if its resolution is not higher.
+    """
+    size = reduced_size(img.size, dpi, scan_dpi, image_dpi(img))
+    if size is None:
+        return img
+
+    img.draft("L", size)
+    return img.resize(size, Image.BOX)
+
+
+def open_preview(source, dpi=None, scan_dpi=None, factor=4):
+    """Decode a small preview of an image.
+
+    The preview is reduced by factor with respect to the working resolution
+    and every pixel is the mean of a block of pixels. JPEG images are reduced
+    while decoding (draft mode), so this is much cheaper than decoding the
+    whole image. The preview is always decoded by PIL.
+
+    Parameters
+    ----------
+    source : object
+        The source of the image, see `form.open_image`.
+    dpi, scan_dpi : optional
+        The working resolution and the resolution of the scan, see
+        `reduced_size`.
+    factor : int, optional
+        The reduction factor.
+
+    Returns
+    -------
+    array
+        The uint8 pixels of the preview.
+    """
+    source = prepare_source(source)
+    if isinstance(source, np.ndarray):
+        img = Image.fromarray(source)
+    else:
+        img = Image.open(source)
+
+    size = img.size
+    if dpi is not None:
+        size = reduced_size(img.size, dpi, scan_dpi, image_dpi(img)) or size
+    size = tuple(max(n // factor, 1) for n in size)
+
+    img.draft("L", size)
+    if img.mode != "L":
+        img = img.convert("L")
+    return np.asarray(img.resize(size, Image.BOX))
+
+
+def prepare_source(source):
+    """Get the pixels as array or the content of the image file.
+
+    Parameters
+    ----------
+    source : object
+        The source of the image, see `form.open_image`.
+
+    Returns
+    -------
+    object
+        The uint8 array of the pixels, a filename or a file-like object.
+    """
+    if isinstance(source, memoryview) and source.ndim == 2:
+        source = np.asarray(source)
+    elif isinstance(source, ArchiveMember):
+        source = source.read()
+
+    if isinstance(source, np.ndarray):
+        if source.ndim != 2 or source.dtype != np.uint8:
+            raise ValueError("pixel data must be a 2-dimensional uint8 array")
+        return np.ascontiguousarray(source)
+
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return io.BytesIO(source)
+    if hasattr(source, "seek"):
+        source.seek(0)
+    return source
+
+
+def affine_rotation(angle, size):
+    """Get the affine matrix of a rotation like `PIL.Image.rotate`.
+
+    Parameters
+    ----------
+    angle : float
+        The angle in degrees counter clockwise.
+    size : tuple
+        The width and the height of the image.
+
+    Returns
+    -------
+    list
+        The coefficients a, b, c, d, e, f which map a point (x, y) of the
+        rotated image to the point (a*x + b*y + c, d*x + e*y + f) of the image.
+    """
+    angle = -math.radians(angle)
+    a, b = round(math.cos(angle), 15), round(math.sin(angle), 15)
+    d, e = round(-math.sin(angle), 15), round(math.cos(angle), 15)
+
+    cx, cy = size[0] / 2, size[1] / 2
+    return [a, b, -a*cx - b*cy + cx, d, e, -d*cx - e*cy + cy]
+
+
+def affine_maps(matrix, size):
+    """Get the source pixels of an affine transformation like PIL.
+
+    PIL finds the nearest neighbors with 16.16 fixed point coordinates (see
+    affine_fixed in Geometry.c of Pillow). The same integer arithmetic gives
+    the same pixels.
+
+    Parameters
+    ----------
+    matrix : list
+        The coefficients of the transformation, see `affine_rotation`.
+    size : tuple
+        The width and the height of the image.
+
+    Returns
+    -------
+    tuple of arrays, shape(height, width)
+        The x and the y coordinate of the source pixel of every pixel.
+    """
+    def fix(v):
+        return int(math.floor(v*65536 + 0.5))
+
+    a, b, c, d, e, f = matrix
+    width, height = size
+    x = np.arange(width, dtype=np.int64)
+    y = np.arange(height, dtype=np.int64)
+
+    # the coordinates of the centers of the pixels, the sums do not overflow
+    # for images smaller than 32768 pixels
+    xx = np.add((fix(c + a/2 + b/2) + fix(b)*y).astype(np.int32)[:, None],
+                (fix(a)*x).astype(np.int32))
+    yy = np.add((fix(f + d/2 + e/2) + fix(e)*y).astype(np.int32)[:, None],
+                (fix(d)*x).astype(np.int32))
+    xx >>= 16
+    yy >>= 16
+    return xx, yy
+
+
+def to_gray(img):
+    """Convert BGR(A) pixels to gray like PIL (ITU-R 601-2 in fixed point)."""
+    b, g, r = [img[..., k].astype(np.uint32) for k in range(3)]
+    return ((r*19595 + g*38470 + b*7471 + 0x8000) >> 16).astype(np.uint8)
+
+
+class PILBackend(object):
+    """The image operations of the forms with PIL.
+
+    The images are Image instances in mode "L". This backend is always
+    available.
+    """
+    name = "pil"
+
+    def open(self, source, dpi=None, scan_dpi=None):
+        """Decode an image, see `form.open_image`."""
+        source = prepare_source(source)
+        if isinstance(source, np.ndarray):
+            img = self.from_array(source)
+        else:
+            img = Image.open(source)
+
+        if dpi is not None:
+            img = reduce_image(img, dpi, scan_dpi)
+        if img.mode != "L":
+            img = img.convert("L")
+        return img
+
+    def from_array(self, data):
+        """Wrap the uint8 pixels of an image, without copying if possible."""
+        if not data.flags.c_contiguous:
+            return Image.fromarray(np.ascontiguousarray(data))
+        height, width = data.shape
+        return Image.frombuffer("L", (width, height), data, "raw", "L", 0, 1)
+
+    def array(self, img):
+        """Get the pixels of an image as uint8 array."""
+        return np.asarray(img)
+
+    def size(self, img):
+        """Get the width and the height of an image."""
+        return img.size
+
+    def crop(self, img, box):
+        """Crop the left, upper, right and lower box, black outside."""
+        return img.crop(box)
+
+    def rotate(self, img, angle):
+        """Rotate an image around its center, black outside."""
+        return img.rotate(angle)
+
+    def translate(self, img, dx, dy):
+        """Shift an image, the pixel (x, y) is taken from (x+dx, y+dy)."""
+        return img.transform(img.size, Image.AFFINE, (1, 0, dx, 0, 1, dy))
+
+    def copy(self, img):
+        return img.copy()
+
+    def rectangle(self, img, box, color=0):
+        """Draw the outline of the box in the image."""
+        ImageDraw.Draw(img).rectangle(box, outline=color)
+
+    def save(self, img, fn):
+        img.save(fn)
+
+
+class OpenCVBackend(object):
+    """The image operations of the forms with OpenCV.
+
+    The images are uint8 arrays, so crops are views and uint8 arrays given as
+    sources are used as they are. All operations give the same pixels as
+    `PILBackend`: JPEG images are decoded by OpenCV and color is converted to
+    gray like PIL does, other formats are decoded by PIL. The rotation
+    computes the nearest neighbors like PIL, see `affine_maps`. Use
+    `compare.compare_backends` to check this and the speed on your scans.
+
+    Raises
+    ------
+    ImportError
+        If OpenCV (cv2) is not installed.
+    """
+    name = "opencv"
+
+    def __init__(self):
+        import cv2
+        self.cv2 = cv2
+
+    def open(self, source, dpi=None, scan_dpi=None):
+        """Decode an image, see `form.open_image`.
+
+        Like in `reduce_image`, JPEG images are already reduced by a power of
+        two while decoding, which also decodes color as gray like the draft
+        mode of PIL.
+        """
+        cv2 = self.cv2
+        source = prepare_source(source)
+
+        if isinstance(source, np.ndarray):
+            size = None
+            if dpi is not None:
+                height, width = source.shape
+                size = reduced_size((width, height), dpi, scan_dpi)
+            if size is None:
+                return source
+            return np.asarray(Image.fromarray(source).resize(size, Image.BOX))
+
+        # only the header of the file is read
+        header = Image.open(source)
+        if header.format != "JPEG" or header.mode not in ("L", "RGB"):
+            return np.asarray(PILBackend().open(source, dpi, scan_dpi))
+
+        size = None
+        if dpi is not None:
+            size = reduced_size(header.size, dpi, scan_dpi, image_dpi(header))
+        if size is not None:
+            # the same power of two as the draft mode of PIL
+            ratio = min(header.size[0] // size[0], header.size[1] // size[1])
+            flag = [cv2.IMREAD_REDUCED_GRAYSCALE_8,
+                    cv2.IMREAD_REDUCED_GRAYSCALE_4,
+                    cv2.IMREAD_REDUCED_GRAYSCALE_2,
+                    cv2.IMREAD_GRAYSCALE][[ratio >= n for n in
+                                           (8, 4, 2, 1)].index(True)]
+        elif header.mode == "RGB":
+            flag = cv2.IMREAD_COLOR
+        else:
+            flag = cv2.IMREAD_GRAYSCALE
+
+        if hasattr(source, "read"):
+            source.seek(0)
+            data = source.read()
+        else:
+            with open(source, "rb") as f:
+                data = f.read()
+        img = cv2.imdecode(np.frombuffer(data, dtype=np.uint8),
+                           flag | cv2.IMREAD_IGNORE_ORIENTATION)
+        if img is None:
+            raise ValueError("the image can not be decoded")
+        if img.ndim == 3:
+            img = to_gray(img)
+
+        if size is not None and (img.shape[1], img.shape[0]) != size:
+            # the box filter of PIL, as the area interpolation of OpenCV
+            # gives other pixels for ratios like 1.5
+            img = np.asarray(Image.fromarray(img).resize(size, Image.BOX))
+        return img
+
+    def from_array(self, data):
+        """Use the uint8 pixels of an image as they are."""
+        return np.asarray(data)
+
+    def array(self, img):
+        return img
+
+    def size(self, img):
+        return img.shape[1], img.shape[0]
+
+    def crop(self, img, box):
+        """Crop the left, upper, right and lower box, black outside.
+
+        The crop is a view into the image if the box is inside.
+        """
+        left, upper, right, lower = [int(c) for c in box]
+        height, width = img.shape
+        if left >= 0 and upper >= 0 and right <= width and lower <= height:
+            return img[upper:lower, left:right]
+
+        out = np.zeros((lower-upper, right-left), dtype=np.uint8)
+        x0, y0 = max(left, 0), max(upper, 0)
+        x1, y1 = min(right, width), min(lower, height)
+        if x0 < x1 and y0 < y1:
+            out[y0-upper:y1-upper, x0-left:x1-left] = img[y0:y1, x0:x1]
+        return out
+
+    def rotate(self, img, angle):
+        """Rotate an image around its center, black outside.
+
+        The nearest neighbors are the ones of `PIL.Image.rotate`, see
+        `affine_maps`, including its shortcuts for multiples of 90 degrees.
+        """
+        angle = angle % 360.0
+        height, width = img.shape
+        if angle == 0:
+            return img.copy()
+        if angle == 180:
+            return img[::-1, ::-1].copy()
+        if angle in (90, 270) and width == height:
+            return np.rot90(img, 1 if angle == 90 else 3).copy()
+
+        xx, yy = affine_maps(affine_rotation(angle, (width, height)),
+                             (width, height))
+        return self.cv2.remap(img, xx.astype(np.float32),
+                              yy.astype(np.float32), self.cv2.INTER_NEAREST,
+                              borderMode=self.cv2.BORDER_CONSTANT,
+                              borderValue=0)
+
+    def translate(self, img, dx, dy):
+        """Shift an image, the pixel (x, y) is taken from (x+dx, y+dy)."""
+        height, width = img.shape
+        return self.crop(img, (dx, dy, dx+width, dy+height)).copy()
+
+    def copy(self, img):
+        return img.copy()
+
+    def rectangle(self, img, box, color=0):
+        """Draw the outline of the box in the image."""
+        left, upper, right, lower = [int(c) for c in np.ravel(box)]
+        self.cv2.rectangle(img, (left, upper), (right, lower), color, 1)
+
+    def save(self, img, fn):
+        self.cv2.imwrite(fn, img)
+
+
+BACKENDS = {"pil": PILBackend, "opencv": OpenCVBackend}
+
+
+def set_backend(name="pil"):
+    """Choose the backend for the image operations of the forms.
+
+    Parameters
+    ----------
+    name : str, optional
+        "pil", "opencv" or "auto", which takes OpenCV if it is installed and
+        PIL otherwise.
+
+    Returns
+    -------
+    object
+        The backend instance.
+    """
+    global _backend
+
+    if name == "auto":
+        try:
+            _backend = OpenCVBackend()
+        except ImportError:
+            _backend = PILBackend()
+    elif name in BACKENDS:
+        _backend = BACKENDS[name]()
+    else:
+        raise ValueError("unknown backend {}".format(name))
+
+    return _backend
+
+
+def get_backend():
+    """Get the backend for the image operations, PIL by default."""
+    if _backend is None:
+        set_backend()
+    return _backend
@@ -1,10 +1,11 @@
 from __future__ import division
 
 import numpy as np
-from PIL import ImageDraw
 
+from .backend import get_backend
 
-class Box:
+
+class Box(object):
     """A box in a form which can be checked
 
     Parameters
@@ -15,37 +16,54 @@ class Box:
         The length of the box in pixel. (static)
     length_exterior : int
         The length of the exterior box in pixel. (static)
+    dpi : int
+        The resolution of the lengths, see `set_resolution`. (static)
     center : tuple
         The coordinates of the center of the box before moving.
     left, upper : int
         The coordinates of the left upper corner of the box with respect to the
         form.
     data : array, shape(length, length)
-        The grayscale (0-255) values for each pixel.
+        The grayscale (0-255) values for each pixel. If a buffer was given, it
+        is a view into this buffer.
 
     Attributes
     ----------
     center_left, center_upper: int
         The coordinates of the center of the box with respect to the form.
     img: object
-        The Image instance of the form.
+        The image of the form, see `backend.get_backend`.
+    out: array, shape(length, length), optional
+        A uint8 buffer which receives the pixels of the box, usually a view
+        into the box data of the whole survey.
+    exterior: int, optional
+        The length of the exterior box in which the corner of the box is
+        searched. Defaults to length_exterior.
     """
     length = 30
     length_box = 24
     length_exterior = 44
+    dpi = 200
+
+    __slots__ = ("center", "left", "upper", "data")
 
-    def __init__(self, center_left, center_upper, img):
+    def __init__(self, center_left, center_upper, img, out=None,
+                 exterior=None):
 
         self.center = center_left, center_upper
 
+        if exterior is None:
+            exterior = Box.length_exterior
+
         # first crop a bigger box from the form
-        self.left = center_left - Box.length_exterior//2
-        self.upper = center_upper - Box.length_exterior//2
+        self.left = center_left - exterior//2
+        self.upper = center_upper - exterior//2
 
-        crop = img.crop((self.left,
-                         self.upper,
-                         self.left+Box.length_exterior,
-                         self.upper+Box.length_exterior))
+        backend = get_backend()
+        crop = backend.array(backend.crop(img, (self.left,
+                                                self.upper,
+                                                self.left+exterior,
+                                                self.upper+exterior)))
 
         # find the corner of the box in the bigger box and adjust the coords
         corner_left, corner_upper = self.find_left_upper_corner(crop)
@@ -53,10 +71,30 @@ class Box:
         self.upper += corner_upper - (Box.length-Box.length_box)//2
 
         # crop the box from the image and create an array
-        self.data = np.array(img.crop((self.left,
-                                       self.upper,
-                                       self.left+Box.length,
-                                       self.upper+Box.length)))
+        if out is None:
+            out = np.empty((Box.length, Box.length), dtype=np.uint8)
+        out[...] = backend.array(backend.crop(img, (self.left,
+                                                    self.upper,
+                                                    self.left+Box.length,
+                                                    self.upper+Box.length)))
+        self.data = out
+
+    @staticmethod
+    def set_resolution(dpi):
+        """Scale the lengths of all boxes to a resolution.
+
+        The lengths above are given for 200 dpi.
+
+        Parameters
+        ----------
+        dpi : int
+            The resolution of the images of the forms.
+        """
+        factor = dpi / 200
+        Box.length = int(round(30*factor))
+        Box.length_box = int(round(24*factor))
+        Box.length_exterior = int(round(44*factor))
+        Box.dpi = dpi
 
     def find_left_upper_corner(self, crop_img, tresh=100):
         """Find the real left upper corner of the box in the image
@@ -67,8 +105,8 @@ class Box:
 
         Parameters
         ----------
-        crop_img: object
-            The Image instance of a surrounding box.
+        crop_img: array
+            The pixels of a surrounding box.
         tresh: int, optional
             Above this treshold every pixel is supposed to be white and all
             other are supposed to be black.
@@ -79,22 +117,30 @@ class Box:
             The left upper corner of the box with respected to crop_img.
 
         """
-        data = np.where(np.array(crop_img) > tresh, 0, 1)
-        width, height = crop_img.size
-
-        max_val = 0
-        left, upper = 0, 0
-        # find the maximum of the sum an L-like snippet in crop_img.
-        for l in np.argsort(np.sum(data[:, :width], axis=0))[-5:][::-1]:
-            for u in np.argsort(np.sum(data[:height//2, :],
-                                       axis=1))[-5:][::-1]:
-                val = (np.sum(data[u:u+Box.length_box, l]) +
-                       np.sum(data[u, l:l+Box.length_box]))
-                if val > max_val:
-                    max_val = val
-                    left, upper = l, u
-
-        return left, upper
+        data = np.where(np.asarray(crop_img) > tresh, 0, 1)
+        height, width = data.shape
+
+        # candidates for the left and the upper line of the box
+        cols = np.argsort(np.sum(data[:, :width], axis=0))[-5:][::-1]
+        rows = np.argsort(np.sum(data[:height//2, :], axis=1))[-5:][::-1]
+
+        # find the maximum of the sum an L-like snippet in crop_img for all
+        # candidates at once, the sums of the lines are taken from cumsums
+        col_sums = np.vstack([np.zeros((1, width), dtype=int),
+                              np.cumsum(data, axis=0)])
+        row_sums = np.hstack([np.zeros((height, 1), dtype=int),
+                              np.cumsum(data, axis=1)])
+        l, u = cols[:, None], rows[None, :]
+        val = (col_sums[np.minimum(u+Box.length_box, height), l] -
+               col_sums[u, l] +
+               row_sums[u, np.minimum(l+Box.length_box, width)] -
+               row_sums[u, l])
+
+        k = np.argmax(val)
+        if val.flat[k] == 0:
+            return 0, 0
+
+        return cols[k // len(rows)], rows[k % len(rows)]
 
     def mark_position(self, img, color=0, lw=4, original=False):
         """Draw the position of the box in an image.
@@ -102,7 +148,7 @@ class Box:
         Parameters
         ----------
         img : object
-            The Image instance of the form.
+            The image of the form, see `backend.get_backend`.
         color : int, optional
             The color of the box in the image.
         lw : int, optional
@@ -118,12 +164,11 @@ class Box:
             left = self.left
             upper = self.upper
 
-        draw = ImageDraw.Draw(img)
+        backend = get_backend()
         for i in range(lw):
-            draw.rectangle([(left+i, upper+i),
-                            (left+Box.length-i, upper+Box.length-i)],
-                           outline=color)
-        del draw
+            backend.rectangle(img, (left+i, upper+i,
+                                    left+Box.length-i, upper+Box.length-i),
+                              color)
 
     def mean(self):
         """Compute the mean of the pixels.
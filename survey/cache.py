@@ -0,0 +1,273 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from .archive import ArchiveMember
+from .backend import get_backend
+from .box import Box
+
+
+def box_bounds(questions, exterior=None):
+    """Get the region of the page which the boxes of the questions need.
+
+    Parameters
+    ----------
+    questions : list
+        The list of Question instances.
+    exterior : int, optional
+        The length of the exterior box in which the corner of each box is
+        searched, see `Box`.
+
+    Returns
+    -------
+    tuple
+        The left, upper, right and lower pixel coordinate of the region, or
+        None if there are no boxes.
+    """
+    coords = [c for q in questions for c in q.coords]
+    if not coords:
+        return None
+
+    if exterior is None:
+        exterior = Box.length_exterior
+    # the corner is searched in the exterior box, the box starts at it
+    margin = exterior + Box.length
+    x, y = zip(*coords)
+    return (min(x)-margin, min(y)-margin, max(x)+margin, max(y)+margin)
+
+
+class PageCache:
+    """On-disk cache of the aligned pages of the forms.
+
+    For every scan the rotation angle and the corner of the header are stored,
+    and the pixels of the rotated and shifted page as uint8 array. Only the
+    region of the page around the boxes is stored, enlarged by `slack` on
+    every side, and its origin is part of the filename. The pages are
+    memory-mapped when they are read. A change of the layout which keeps the
+    header and the boxes in the stored region, e.g. other offsets or more
+    questions, reuses the pages without decoding the scans.
+
+    Parameters
+    ----------
+    directory : str
+        The directory of the cache.
+    header : tupel
+        The left, upper, right and lower pixel coordinate of the header. It is
+        part of the keys, as the alignment depends on it.
+    resolution : tuple, optional
+        The working resolution and the resolution of the scans, see
+        `form.open_image`. It is part of the keys too, like the name of the
+        backend, see `backend.get_backend`.
+    classify : dict, optional
+        The parameters to tell forms from other pages, see
+        `form.classify_page`. They are part of the keys too.
+    slack : int, optional
+        The pixels which are stored in addition around the region of the
+        boxes, so the boxes can move that far, e.g. by another offset.
+    """
+    def __init__(self, directory, header, resolution=(None, None),
+                 classify=None, slack=100):
+        self.directory = directory
+        self.slack = slack
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        # the parameters of the alignment, see Form.rotate and Form.shift
+        self.params = repr((tuple(header), tuple(resolution),
+                            get_backend().name, "rect", 60, 40,
+                            sorted((classify or {}).items()))).encode("ascii")
+
+    def key(self, source, region=None):
+        """Compute the key of a scan from its content.
+
+        Parameters
+        ----------
+        source : object
+            The source of the image, see `form.open_image`.
+        region : tuple, optional
+            The region of the form on the page, see `Form`.
+
+        Returns
+        -------
+        str
+            The key of the scan.
+        """
+        h = hashlib.sha1(self.params)
+        if region is not None:
+            h.update(repr(tuple(region)).encode("ascii"))
+
+        if isinstance(source, memoryview) and source.ndim == 2:
+            source = np.asarray(source)
+        elif isinstance(source, ArchiveMember):
+            source = source.read()
+
+        if isinstance(source, np.ndarray):
+            h.update(repr(source.shape).encode("ascii"))
+            h.update(np.ascontiguousarray(source))
+        elif isinstance(source, (bytes, bytearray, memoryview)):
+            h.update(source)
+        elif hasattr(source, "read"):
+            source.seek(0)
+            h.update(source.read())
+            source.seek(0)
+        else:
+            with open(source, "rb") as f:
+                h.update(f.read())
+
+        return h.hexdigest()
+
+    def filename(self, key, suffix):
+        return os.path.join(self.directory, key[:2], key + suffix)
+
+    def get_alignment(self, key):
+        """Get the angle and the corner of the header of a scan.
+
+        Returns
+        -------
+        tuple
+            The angle and the corner or None if the scan is not cached.
+        """
+        fn = self.filename(key, ".json")
+        if not os.path.isfile(fn):
+            return None
+
+        with open(fn) as f:
+            data = json.load(f)
+        if "angle" not in data:
+            return None
+        return data["angle"], tuple(data["corner"])
+
+    def set_alignment(self, key, angle, corner):
+        """Store the angle and the corner of the header of a scan."""
+        self.write(self.filename(key, ".json"),
+                   lambda f: f.write(json.dumps({
+                       "angle": float(angle),
+                       "corner": [int(c) for c in corner]}).encode("ascii")))
+
+    def get_kind(self, key):
+        """Get the kind of a scan, see `form.classify_page`.
+
+        Returns
+        -------
+        str
+            "form", "blank" or "foreign", or None if the scan is not cached.
+        """
+        fn = self.filename(key, ".json")
+        if not os.path.isfile(fn):
+            return None
+
+        with open(fn) as f:
+            return json.load(f).get("kind", "form")
+
+    def set_kind(self, key, kind):
+        """Store the kind of a scan which is not a form."""
+        self.write(self.filename(key, ".json"),
+                   lambda f: f.write(json.dumps({"kind": kind})
+                                     .encode("ascii")))
+
+    def pages(self, key, offset):
+        """Find the stored regions of the aligned page of a scan.
+
+        Returns
+        -------
+        list
+            The tuples of the filename, the origin of the region and the size
+            of the page.
+        """
+        directory = os.path.dirname(self.filename(key, ""))
+        if not os.path.isdir(directory):
+            return []
+
+        prefix = "{}_{}_{}_".format(key, *offset)
+        pages = []
+        for f in os.listdir(directory):
+            if not (f.startswith(prefix) and f.endswith(".npy")):
+                continue
+            values = f[len(prefix):-4].split("_")
+            if len(values) == 4 and all(v.isdigit() for v in values):
+                left, upper, width, height = [int(v) for v in values]
+                pages.append((os.path.join(directory, f), (left, upper),
+                              (width, height)))
+        return pages
+
+    def get_page(self, key, offset, bounds=None):
+        """Get the aligned page of a scan.
+
+        Parameters
+        ----------
+        key : str
+            The key of the scan.
+        offset : tuple
+            The shift of the page in x and y direction.
+        bounds : tuple, optional
+            The region of the page which is needed, see `box_bounds`.
+
+        Returns
+        -------
+        object
+            The image of the page, black outside the stored region, or None
+            if the page is not cached or the region does not contain bounds.
+        """
+        for fn, (left, upper), (width, height) in self.pages(key, offset):
+            pixels = np.load(fn, mmap_mode="r")
+            if bounds is not None:
+                l, u, r, b = clip(bounds, (width, height))
+                if l < left or u < upper or r > left+pixels.shape[1] or \
+                        b > upper+pixels.shape[0]:
+                    continue
+
+            page = np.zeros((height, width), dtype=np.uint8)
+            page[upper:upper+pixels.shape[0],
+                 left:left+pixels.shape[1]] = pixels
+            return get_backend().from_array(page)
+
+        return None
+
+    def set_page(self, key, offset, img, bounds=None):
+        """Store the aligned page of a scan.
+
+        Parameters
+        ----------
+        key : str
+            The key of the scan.
+        offset : tuple
+            The shift of the page in x and y direction.
+        img : object
+            The aligned image.
+        bounds : tuple, optional
+            The region of the page which is needed, see `box_bounds`. It is
+            stored with `slack` around it. By default the whole page is
+            stored.
+        """
+        backend = get_backend()
+        size = backend.size(img)
+        region = (0, 0) + tuple(size)
+        if bounds is not None:
+            region = clip((bounds[0]-self.slack, bounds[1]-self.slack,
+                           bounds[2]+self.slack, bounds[3]+self.slack), size)
+        pixels = backend.array(backend.crop(img, region))
+
+        for fn, _, _ in self.pages(key, offset):
+            os.unlink(fn)
+        self.write(self.filename(key, "_{}_{}_{}_{}_{}_{}.npy".format(
+                       offset[0], offset[1], region[0], region[1], *size)),
+                   lambda f: np.save(f, np.asarray(pixels, dtype=np.uint8)))
+
+    def write(self, fn, write):
+        """Write a file of the cache atomically."""
+        directory = os.path.dirname(fn)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        tmp = "{}.{}.tmp".format(fn, os.getpid())
+        with open(tmp, "wb") as f:
+            write(f)
+        os.rename(tmp, fn)
+
+
+def clip(box, size):
+    """Clip the left, upper, right and lower box to an image of the size."""
+    return (max(box[0], 0), max(box[1], 0), min(box[2], size[0]),
+            min(box[3], size[1]))
@@ -0,0 +1,180 @@
+from __future__ import division
+
+import random
+
+import numpy as np
+
+from .backend import get_backend, open_preview
+from .box import Box
+from .form import Form, classify_page
+from .survey import collect_sources
+
+
+def frame_scores(page, centers, tresh=100):
+    """Count the black pixels on the frames of boxes.
+
+    The frames of all boxes are evaluated at once with the cumulative sums of
+    the rows and columns of the page.
+
+    Parameters
+    ----------
+    page : array, shape(height, width)
+        The grayscale pixels of the aligned form.
+    centers : array, shape(..., 2)
+        The integer coordinates of the centers of the boxes.
+    tresh : int, optional
+        All pixels lower or equal than the treshold are supposed to be black.
+
+    Returns
+    -------
+    array, shape(...)
+        The number of black pixels on the frame of each box.
+    """
+    dark = (page <= tresh).astype(np.int32)
+    height, width = dark.shape
+    n = Box.length_box
+
+    rows = np.hstack([np.zeros((height, 1), dtype=np.int32),
+                      np.cumsum(dark, axis=1)])
+    cols = np.vstack([np.zeros((1, width), dtype=np.int32),
+                      np.cumsum(dark, axis=0)])
+
+    left = np.clip(centers[..., 0] - n//2, 0, width-n)
+    upper = np.clip(centers[..., 1] - n//2, 0, height-n)
+    right, lower = left+n-1, upper+n-1
+
+    return (rows[upper, left+n] - rows[upper, left] +
+            rows[lower, left+n] - rows[lower, left] +
+            cols[upper+n, left] - cols[upper, left] +
+            cols[upper+n, right] - cols[upper, right])
+
+
+def align_form(layout, name, source):
+    """Create a form of the layout and correct its skew.
+
+    Parameters
+    ----------
+    layout : object
+        The Layout instance of the survey.
+    name : str
+        The name of the form.
+    source : object
+        The source of the image, see `form.open_image`.
+
+    Returns
+    -------
+    tuple
+        The rotated Form instance and the left upper corner of the bounding
+        box of its header, or None if the page is no form, like in
+        `Survey.align_form`.
+    """
+    preview = open_preview(source, layout.dpi, layout.scan_dpi)
+    if classify_page(preview, layout.header, layout.regions[0],
+                     **layout.classify) != "form":
+        return None
+    form = Form(source, layout.questions, layout.header, name,
+                dpi=layout.dpi, scan_dpi=layout.scan_dpi,
+                region=layout.regions[0])
+    try:
+        form.rotate()
+        return form, form.get_left_upper_bbox_header()
+    except ValueError:
+        return None
+
+
+def calibrate(layout, n_samples=10, shift=8, scales=None, margin=3,
+              seed=None):
+    """Find the global offset (and scale) of the boxes of a layout.
+
+    A sample of the forms is aligned like in the survey. For every candidate
+    offset (dx, dy) in [-shift, shift] and every scale the black pixels on the
+    frames of all boxes are counted in one vectorized pass. Like in the
+    survey, all forms are aligned to the first scan which is a form, so it is
+    always part of the sample. Pages which are no forms are skipped, see
+    `form.classify_page`, so the sample may be smaller. On pages with several forms
+    the first region is used.
+
+    The remaining deviation of the single boxes from the best offset gives a
+    smaller exterior box for the corner search, see `Box`.
+
+    Parameters
+    ----------
+    layout : object
+        The Layout instance of the survey.
+    n_samples : int, optional
+        The number of forms.
+    shift : int, optional
+        The maximal change of the offset in pixel.
+    scales : list, optional
+        The candidates for the scale of the coordinates with respect to the
+        left upper corner of the header. Defaults to no scaling.
+    margin : int, optional
+        The number of pixels added on each side to the deviation of the boxes
+        to get the exterior box.
+    seed : int, optional
+        The seed for the random sample.
+
+    Returns
+    -------
+    dict
+        The new values of the layout: "offset", "scale" and "search" in the
+        unit of the layout.
+
+    Raises
+    ------
+    ValueError
+        If none of the scans is a form.
+    """
+    Box.set_resolution(layout.dpi)
+    sources = collect_sources(layout.directory)
+
+    # the reference corner of the header, see Survey.align_form
+    first = None
+    for k, (name, source) in enumerate(sources):
+        first = align_form(layout, name, source)
+        if first is not None:
+            break
+    if first is None:
+        raise ValueError("no forms found in {}".format(layout.directory))
+    reference = first[1]
+
+    rest = sources[k+1:]
+    rnd = random.Random(seed)
+    sample = rnd.sample(rest, min(n_samples-1, len(rest)))
+
+    scales = np.asarray(scales if scales is not None else [1.0], dtype=float)
+    d = np.arange(-shift, shift+1)
+
+    # centers for all scales, offsets in y and x direction and boxes
+    coords = np.array([c for q in layout.questions for c in q.coords],
+                      dtype=float)
+    left, upper = layout.header[:2]
+    x = left + scales[:, None]*(coords[:, 0]-left) + layout.off_x
+    y = upper + scales[:, None]*(coords[:, 1]-upper) + layout.off_y
+    cx = np.rint(x[:, None, None, :] + d[None, None, :, None]).astype(int)
+    cy = np.rint(y[:, None, None, :] + d[None, :, None, None]).astype(int)
+    centers = np.stack(np.broadcast_arrays(cx, cy), axis=-1)
+
+    scores = []
+    for aligned in [first] + [align_form(layout, name, source)
+                              for name, source in sample]:
+        if aligned is None:
+            continue
+        form = aligned[0]
+        form.shift(*reference)
+        scores.append(frame_scores(get_backend().array(form.img), centers))
+    scores = np.array(scores)
+
+    s, iy, ix = np.unravel_index(np.argmax(scores.sum(axis=(0, 4))),
+                                 scores.shape[1:4])
+
+    # deviation of every box from the best offset
+    box_scores = scores[:, s].reshape(len(scores), len(d)*len(d), -1)
+    by, bx = np.unravel_index(np.argmax(box_scores, axis=1), (len(d), len(d)))
+    deviation = np.percentile(np.maximum(np.abs(by-iy), np.abs(bx-ix)), 95)
+    search = Box.length_box + 2*(int(np.ceil(deviation)) + margin)
+
+    return {"offset": [layout.to_unit(layout.off_x + d[ix]),
+                       layout.to_unit(layout.off_y + d[iy])],
+            "scale": round(float(layout.scale*scales[s]), 4),
+            "search": layout.to_unit(min(search, Box.length_exterior))}
@@ -0,0 +1,523 @@
+from __future__ import print_function, division
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+from .backend import set_backend
+from .box import Box
+from .layout import load_layout
+from .survey import Survey, collect_sources, count_answers, select_questions
+from .report import read_answers, write_report
+from .statistic import get_pyplot
+
+
+def extract(filename, directory):
+    """extract images from pdf
+
+    Makes sure the directory exists and is empty.
+    Call pdfimages to extract the images from the file to the directory.
+
+    Parameters
+    ----------
+    filename : str
+        The filename of the pdf-file.
+    directory : str
+        The directory for the images.
+
+    """
+    print("check if directory exists")
+    if os.path.exists(directory):
+        print("clear directory")
+        if os.path.isdir(directory):
+            for f in os.listdir(directory):
+                fn = os.path.join(directory, f)
+                if os.path.isfile(fn):
+                    os.unlink(fn)
+        else:
+            print("{} is no directory!".format(directory))
+            sys.exit(1)
+    else:
+        print("create directory")
+        os.makedirs(directory)
+
+    print("extract images from pdf")
+    cmd = "pdfimages -j {} {}/fragebogen".format(filename, directory)
+    subprocess.call(cmd, shell=True)
+
+
+def evaluate(layout, check=False, cache=None, select=None):
+    """Do the evaluation of the survey
+
+    Parameters
+    ----------
+    layout : object
+        The Layout instance of the survey.
+    check : boolean, optional
+        If check is true, then for every the positions of the boxes will be
+        marked, see scan directory for the images.
+    cache : str, optional
+        The directory of the cache for the aligned pages.
+    select : list, optional
+        Evaluate only the questions with these titles. The answers are stored
+        to a separate csv file and only their statistics are printed.
+    """
+    survey = Survey(layout.directory, layout.questions, layout.header,
+                    layout.off_x, layout.off_y, layout.lower, layout.upper,
+                    cache=cache, search=layout.search, dpi=layout.dpi,
+                    scan_dpi=layout.scan_dpi, select=select,
+                    regions=layout.regions, classify=layout.classify)
+    if not survey.forms:
+        raise SystemExit("no forms found in {}".format(layout.directory))
+
+    if select is not None:
+        fn = "{}-subset{}".format(*os.path.splitext(layout.csv_fn))
+        print("find answers and store to {}".format(fn))
+        ans = survey.write_answers_to_csv(fn, log="review-subset",
+                                          duplicates=False)
+        for title, counter in survey.statistics(ans):
+            print("{}: {}".format(title, ", ".join(
+                "{} {}".format(k if k else "keine Angabe", v)
+                for k, v in counter.items())))
+        return
+
+    print("check positions, see check.png")
+    survey.check_positions(original=True)
+
+    print("find forms which were scanned twice")
+    if survey.find_duplicates():
+        print("{} forms were scanned twice, see review/index.html".format(
+            len(survey.duplicates)))
+
+    print("find answers and store to csv")
+    ans = survey.write_answers_to_csv(layout.csv_fn, log="review")
+    stats = survey.statistics(ans)
+
+    print("store statistics and plots for LaTex report")
+    counted = [a for i, a in enumerate(ans) if i not in survey.duplicates]
+    try:
+        write_report(stats, counted, "report", layout.crosstabs)
+    except ValueError as e:
+        raise SystemExit("the report can not be written: {}".format(e))
+
+    print("store boxes to analyze")
+    boxes = survey.get_box_data()
+    np.save("boxes", boxes)
+
+    if check:
+        print("mark all boxes in the forms, see scan directory")
+        survey.check_all()
+
+
+def report(layout, directory="report"):
+    """Update the data and the plots of the LaTeX report from the csv file.
+
+    Parameters
+    ----------
+    layout : object
+        The Layout instance of the survey.
+    directory : str, optional
+        The directory of the report.
+    """
+    titles, answers = read_answers(layout.csv_fn)
+
+    # the questions in the order of the columns of the csv file
+    try:
+        questions = select_questions(layout.questions, titles)
+    except ValueError as e:
+        raise SystemExit("{} does not match the layout: {}".format(
+            layout.csv_fn, e))
+    questions.sort(key=lambda q: titles.index(q.title))
+
+    try:
+        written = write_report(count_answers(questions, answers), answers,
+                               directory, layout.crosstabs)
+    except ValueError as e:
+        raise SystemExit("the report can not be written: {}".format(e))
+    print("{} files written".format(len(written)))
+    for fn in written:
+        print("  {}".format(fn))
+
+
+def show(plt, fn=""):
+    """Show the current figure or save it to a file and close it."""
+    if fn:
+        plt.savefig(fn)
+        plt.close()
+    else:
+        plt.show()
+
+
+def show_boxes_around(plt, boxes, mean, bound, max_n=20, r=15, fn=""):
+    """Displays all boxes with a mean around the box with distance r. There
+    will be max_n numbers of boxes for each mean value. If a filename is
+    given, the plot is saved to the file."""
+
+    ind = np.where((mean >= bound-r) & (mean <= bound+r))[0]
+
+    if len(ind) > 0:
+
+        boxes = boxes[ind]
+        mean = mean[ind].astype(int)
+
+        # map mean values to indizes
+        ind = {}
+        for k, v in enumerate(mean):
+            ind.setdefault(v, []).append(k)
+
+        max_n = min(max([len(v) for v in ind.values()]), max_n)
+
+        length = Box.length
+        n_rows = len(ind.keys())
+        data = 255*np.ones((length*n_rows, length*max_n))
+        for r, key in enumerate(sorted(ind.keys())):
+            for c, v in enumerate(ind[key]):
+                if c == max_n:
+                    break
+                data[r*length:(r+1)*length,
+                     c*length:(c+1)*length] = boxes[v].reshape(length, length)
+
+        plt.imshow(data, cmap="gray", interpolation="nearest")
+        plt.yticks(range(length//2, n_rows*length, length), sorted(ind))
+        plt.xticks([])
+        plt.ylabel("Mean")
+        plt.title("Boxes around {}".format(bound))
+        show(plt, fn)
+
+    else:
+        print("nothing near the bound {}".format(bound))
+
+
+def analyze(layout, output=None):
+    """Show the histogram of the mean for the boxes and show the boxes around
+    lower and upper bound.
+
+    Parameters
+    ----------
+    layout : object
+        The Layout instance of the survey.
+    output : str, optional
+        If a directory is given, the plots are saved there instead of being
+        displayed and no display is needed.
+    """
+    plt = get_pyplot(headless=output is not None)
+    Box.set_resolution(layout.dpi)
+
+    def filename(name):
+        return os.path.join(output, name) if output is not None else ""
+
+    # read boxes and compute mean
+    boxes = np.load("boxes.npy")
+    mean = np.mean(boxes, axis=1)
+
+    # sort by mean
+    ind = np.argsort(mean)
+    boxes = boxes[ind]
+    mean = mean[ind]
+
+    n, bins, patches = plt.hist(mean, bins=50)
+    m = max(n)
+    plt.plot([layout.lower, layout.lower], [0, m], "r-")
+    plt.plot([layout.upper, layout.upper], [0, m], "r-")
+    plt.xlabel('Mean')
+    show(plt, filename("histogram.png"))
+
+    show_boxes_around(plt, boxes, mean, layout.lower,
+                      fn=filename("boxes_lower.png"))
+    show_boxes_around(plt, boxes, mean, layout.upper,
+                      fn=filename("boxes_upper.png"))
+
+
+def calibrate(layout, fn, n_samples=10, shift=8, scale=0, dry_run=False):
+    """Find the offset of the boxes and store it in the layout file.
+
+    Parameters
+    ----------
+    layout : object
+        The Layout instance of the survey.
+    fn : str
+        The filename of the layout.
+    n_samples : int, optional
+        The number of forms to sample.
+    shift : int, optional
+        The maximal change of the offset in pixel.
+    scale : float, optional
+        If positive, scales in [1-scale, 1+scale] are tried too.
+    dry_run : boolean, optional
+        Only print the result.
+    """
+    from .calibrate import calibrate as find_calibration
+    from .layout import update_layout
+
+    scales = np.linspace(1-scale, 1+scale, 5) if scale > 0 else None
+    try:
+        values = find_calibration(layout, n_samples, shift, scales)
+    except ValueError as e:
+        raise SystemExit("calibration failed: {}".format(e))
+    if scales is None:
+        del values["scale"]
+
+    print("calibration: {}".format(
+        ", ".join("{} {}".format(k, v) for k, v in sorted(values.items()))))
+    if not dry_run:
+        update_layout(fn, **values)
+        print("stored to {}".format(fn))
+
+
+def progressive(layout, batch_size=20, precision=None, seed=None,
+                output=None):
+    """Print the statistics of a growing random sample of the forms.
+
+    Parameters
+    ----------
+    layout : object
+        The Layout instance of the survey.
+    batch_size : int, optional
+        The number of forms of a batch.
+    precision : float, optional
+        Stop when all 95% confidence intervals are within +- precision.
+    seed : int, optional
+        The seed for the random order of the forms.
+    output : str, optional
+        A JSON file which is updated with the statistics after each batch.
+    """
+    from .progressive import progressive_statistics
+
+    stats = None
+    try:
+        for n, total, stats in progressive_statistics(
+                layout, None, batch_size, precision, seed=seed):
+            width = max(high-low for title, answers in stats
+                        for p, low, high in answers.values())
+            print("{:4d}/{} forms, largest interval +-{:.1f}%".format(
+                n, total, 50*width))
+
+            if output is not None:
+                with open(output, "w") as f:
+                    json.dump({"forms": n, "total": total, "statistics": [
+                        {"title": title, "answers": answers}
+                        for title, answers in stats]}, f, indent=1)
+    except ValueError as e:
+        raise SystemExit("no statistics: {}".format(e))
+
+    if stats is None:
+        print("no forms found in {}".format(layout.directory))
+        return
+
+    for title, answers in stats:
+        print(title)
+        for answer, (p, low, high) in answers.items():
+            print("  {:25s} {:5.1f}% [{:5.1f}%, {:5.1f}%]".format(
+                answer if answer else "keine Angabe", 100*p, 100*low,
+                100*high))
+
+
+def serve(layout, host, port, reference=None, max_forms=16, max_wait=0.01,
+          workers=None):
+    """Run the HTTP service to evaluate scans, see `service.Server`.
+
+    Parameters
+    ----------
+    layout : object
+        The Layout instance of the survey.
+    host : str
+        The host name or address to listen on.
+    port : int
+        The port.
+    reference : str, optional
+        The scan to get the reference corner of the header from. Defaults to
+        the first form in the directory of the layout.
+    max_forms, max_wait, workers : optional
+        The parameters of the batches, see `service.Batcher`.
+    """
+    from .evaluator import Evaluator
+    from .service import Server
+
+    if reference is None:
+        reference = collect_sources(layout.directory)
+    try:
+        evaluator = Evaluator(layout, reference)
+    except ValueError as e:
+        raise SystemExit("the service can not be started: {}".format(e))
+
+    server = Server((host, port), evaluator, max_forms, max_wait, workers)
+    print("serve on http://{}:{}/evaluate".format(*server.server_address))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    server.server_close()
+
+
+def compare(layout_fn, first="pil", second="opencv"):
+    """Compare the answers and the box data of two backends.
+
+    Parameters
+    ----------
+    layout_fn : str
+        The filename of the layout.
+    first, second : str, optional
+        The names of the backends, see `backend.set_backend`.
+
+    Returns
+    -------
+    boolean
+        True if the answers and all box pixels are the same.
+    """
+    from .compare import compare_backends
+
+    result = compare_backends(layout_fn, first, second)
+    print("{} forms, {}: {:.2f} s, {}: {:.2f} s".format(
+        result["forms"], first, result["times"][0], second,
+        result["times"][1]))
+    print("{} box pixels differ, at most by {}".format(
+        result["pixels"], result["max_diff"]))
+    for fn, title, a, b in result["answers"]:
+        print("{}: {}: {!r} != {!r}".format(fn, title, a, b))
+    print("{} different answers".format(len(result["answers"])))
+    return not result["answers"] and not result["pixels"]
+
+
+def main(argv=None):
+    """Entry point of the command line interface.
+
+    Parameters
+    ----------
+    argv : list, optional
+        The arguments without the program name. Defaults to sys.argv[1:].
+    """
+    parser = argparse.ArgumentParser(
+        prog="survey.py",
+        description="Evaluation of a survey by image analysis")
+    parser.add_argument("--layout", default="layout.json",
+                        help="the layout file of the forms "
+                             "(default: %(default)s)")
+    parser.add_argument("--backend", choices=["pil", "opencv", "auto"],
+                        help="the library for the image operations "
+                             "(default: backend of the layout or pil)")
+    commands = parser.add_subparsers(dest="command", metavar="<command>")
+
+    cmd = commands.add_parser("extract",
+                              help="clear scan folder and extract all scans "
+                                   "from filename to the folder")
+    cmd.add_argument("filename", help="the pdf-file with the scans")
+
+    cmd = commands.add_parser("evaluate",
+                              help="evaluate the survey and store the results")
+    cmd.add_argument("--check", action="store_true",
+                     help="mark box positions in all forms")
+    cmd.add_argument("--cache", metavar="DIR",
+                     help="cache the aligned pages in the directory, so "
+                          "changes of the layout do not decode the scans "
+                          "again")
+    cmd.add_argument("--select", metavar="TITLE", action="append",
+                     help="evaluate only this question (repeatable)")
+
+    commands.add_parser("evaluate&check",
+                        help="call evaluate and mark box positions in all "
+                             "forms")
+
+    commands.add_parser("report",
+                        help="update the data and plots of the report from "
+                             "the csv file")
+
+    cmd = commands.add_parser("analyze",
+                              help="show some hints to adjust the parameters")
+    cmd.add_argument("--output", metavar="DIR",
+                     help="save the plots to the directory instead of "
+                          "showing them")
+
+    cmd = commands.add_parser("calibrate",
+                              help="find the offset of the boxes from a "
+                                   "sample of the forms")
+    cmd.add_argument("--samples", type=int, default=10,
+                     help="the number of forms (default: %(default)s)")
+    cmd.add_argument("--shift", type=int, default=8,
+                     help="the maximal change of the offset in pixel "
+                          "(default: %(default)s)")
+    cmd.add_argument("--scale", type=float, default=0,
+                     help="also try scales between 1-SCALE and 1+SCALE")
+    cmd.add_argument("--dry-run", action="store_true",
+                     help="do not change the layout file")
+
+    cmd = commands.add_parser("progressive",
+                              help="show the statistics of a growing random "
+                                   "sample with confidence intervals")
+    cmd.add_argument("--batch", type=int, default=20,
+                     help="the number of forms of a batch "
+                          "(default: %(default)s)")
+    cmd.add_argument("--precision", type=float,
+                     help="stop when all 95%% confidence intervals are "
+                          "within +-PRECISION (e.g. 0.05)")
+    cmd.add_argument("--seed", type=int, help="the seed of the random order")
+    cmd.add_argument("--output", metavar="FILE",
+                     help="update the statistics in the JSON file after "
+                          "each batch")
+
+    cmd = commands.add_parser("serve",
+                              help="run a HTTP service to evaluate scans")
+    cmd.add_argument("--host", default="localhost",
+                     help="the address to listen on (default: %(default)s)")
+    cmd.add_argument("--port", type=int, default=8080,
+                     help="the port (default: %(default)s)")
+    cmd.add_argument("--reference", metavar="SCAN",
+                     help="the scan to align all forms to (default: the "
+                          "first scan in the directory)")
+    cmd.add_argument("--batch", type=int, default=16,
+                     help="the maximal number of forms of a batch "
+                          "(default: %(default)s)")
+    cmd.add_argument("--wait", type=float, default=10,
+                     help="the maximal time in ms to wait for a batch "
+                          "(default: %(default)s)")
+    cmd.add_argument("--workers", type=int,
+                     help="the number of threads which evaluate the scans "
+                          "(default: number of cpus)")
+
+    cmd = commands.add_parser("compare",
+                              help="evaluate the survey with two backends "
+                                   "and compare the pixels and answers")
+    cmd.add_argument("--backends", nargs=2, default=["pil", "opencv"],
+                     choices=["pil", "opencv"], metavar="NAME",
+                     help="the backends (default: pil opencv)")
+
+    args = parser.parse_args(argv)
+    if args.command is None:
+        parser.print_help()
+        return 1
+
+    layout = load_layout(args.layout)
+    if args.command == "evaluate" and args.select:
+        try:
+            select_questions(layout.questions, args.select)
+        except ValueError as e:
+            parser.error("--select: {}".format(e))
+    set_backend(args.backend or layout.backend)
+
+    if args.command == "extract":
+        extract(args.filename, layout.directory)
+    elif args.command == "evaluate":
+        evaluate(layout, args.check, args.cache, args.select)
+    elif args.command == "evaluate&check":
+        evaluate(layout, True)
+    elif args.command == "report":
+        report(layout)
+    elif args.command == "analyze":
+        analyze(layout, args.output)
+    elif args.command == "calibrate":
+        calibrate(layout, args.layout, args.samples, args.shift, args.scale,
+                  args.dry_run)
+    elif args.command == "progressive":
+        progressive(layout, args.batch, args.precision, args.seed,
+                    args.output)
+    elif args.command == "serve":
+        serve(layout, args.host, args.port, args.reference, args.batch,
+              args.wait/1000, args.workers)
+    elif args.command == "compare":
+        if not compare(args.layout, *args.backends):
+            return 1
+
+    return 0
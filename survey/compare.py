@@ -0,0 +1,64 @@
+from __future__ import division
+
+from time import time
+
+import numpy as np
+
+from .backend import get_backend, set_backend
+from .layout import load_layout
+from .survey import Survey
+
+
+def compare_backends(fn, first="pil", second="opencv"):
+    """Evaluate a survey with two backends and compare the results.
+
+    Parameters
+    ----------
+    fn : str
+        The filename of the layout. It is loaded for every backend, as the
+        survey moves the boxes of the questions.
+    first, second : str, optional
+        The names of the backends, see `backend.set_backend`.
+
+    Returns
+    -------
+    dict
+        "forms": the number of forms,
+        "answers": a list of tuples of the form, the question and the two
+        different answers,
+        "pixels": the number of box pixels which differ,
+        "max_diff": the largest difference of a box pixel,
+        "times": the time of each backend in seconds.
+    """
+    previous = get_backend()
+    results = []
+    try:
+        for name in (first, second):
+            set_backend(name)
+            layout = load_layout(fn)
+            start = time()
+            survey = Survey(layout.directory, layout.questions,
+                            layout.header, layout.off_x, layout.off_y,
+                            layout.lower, layout.upper, verbose=False,
+                            search=layout.search, dpi=layout.dpi,
+                            scan_dpi=layout.scan_dpi, regions=layout.regions,
+                            classify=layout.classify)
+            answers, _ = survey.get_answers()
+            results.append((survey, answers, time()-start))
+    finally:
+        set_backend(previous.name)
+
+    (a, answers_a, time_a), (b, answers_b, time_b) = results
+    if [f.fn for f in a.forms] != [f.fn for f in b.forms]:
+        raise ValueError("the backends reject different pages")
+
+    differences = [(form.fn, q.title, x, y)
+                   for form, row_a, row_b in zip(a.forms, answers_a, answers_b)
+                   for q, x, y in zip(a.questions, row_a, row_b) if x != y]
+    diff = np.abs(a.box_data.astype(int) - b.box_data)
+
+    return {"forms": len(a.forms),
+            "answers": differences,
+            "pixels": int(np.count_nonzero(diff)),
+            "max_diff": int(diff.max()) if diff.size else 0,
+            "times": (time_a, time_b)}
@@ -0,0 +1,89 @@
+from __future__ import division
+
+import numpy as np
+
+
+def signatures(means, checked, step=16, band=4):
+    """Compute the hash keys of the forms.
+
+    The signature of a form is the bit-packed vector of the checked boxes
+    together with the quantized means of the checked boxes. The means are
+    split into bands of a few boxes and quantized on two grids shifted by half
+    a step, so two scans of the same sheet share at least one key even if
+    their means differ a little.
+
+    Parameters
+    ----------
+    means : array, shape(n_forms, n_boxes)
+        The mean of the pixels of each box.
+    checked : array, shape(n_forms, n_boxes)
+        The status of each box.
+    step : int, optional
+        The step of the quantization of the means.
+    band : int, optional
+        The number of boxes of a band.
+
+    Returns
+    -------
+    list
+        The list of the keys for each form.
+    """
+    keys = []
+    for m, c in zip(means, checked):
+        answers = np.packbits(c).tobytes()
+        m = m[c]
+
+        form_keys = []
+        for start in range(0, max(len(m), 1), band):
+            for shift in (0, step//2):
+                q = ((m[start:start+band] + shift)//step).astype(np.uint8)
+                form_keys.append((start, shift, answers, q.tobytes()))
+        keys.append(form_keys)
+
+    return keys
+
+
+def find_duplicates(means, checked, tol=6, step=16, band=4):
+    """Find forms which are scans of the same sheet.
+
+    The forms are put into a hash index by their signatures, see
+    `signatures`. Only forms which share a key are compared, so the search
+    runs in nearly linear time. Two forms are duplicates if the same boxes are
+    checked and the means of all boxes differ by at most tol.
+
+    Parameters
+    ----------
+    means : array, shape(n_forms, n_boxes)
+        The mean of the pixels of each box.
+    checked : array, shape(n_forms, n_boxes)
+        The status of each box.
+    tol : float, optional
+        The maximal difference of the means of a box.
+    step, band : int, optional
+        The parameters of the signatures.
+
+    Returns
+    -------
+    dict
+        Maps the index of every duplicate to the index of the first form of
+        the same sheet.
+    """
+    index = {}
+    duplicates = {}
+
+    for i, keys in enumerate(signatures(means, checked, step, band)):
+        candidates = set()
+        for key in keys:
+            candidates.update(index.get(key, ()))
+
+        for j in sorted(candidates):
+            if (np.array_equal(checked[i], checked[j]) and
+                    np.max(np.abs(means[i] - means[j])) <= tol):
+                duplicates[i] = j
+                break
+        else:
+            # only the first form of a sheet is added to the index
+            for key in keys:
+                index.setdefault(key, []).append(i)
+
+    return duplicates
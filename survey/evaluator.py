@@ -0,0 +1,138 @@
+import copy
+
+from .backend import open_preview
+from .form import Form, classify_page
+from .survey import Survey, collect_sources
+
+
+class Evaluator:
+    """Evaluate scans of forms with a fixed layout.
+
+    The layout and the reference corner of the header are set up once, so
+    every call only processes the given scans.
+
+    Attributes
+    ----------
+    questions : list
+        Copies of the Question instances of the layout with the offset
+        applied.
+    header : tupel
+        The left, upper, right and lower pixel coordinate of the header.
+    regions : list
+        The regions of the forms on a page, see `layout.Layout`.
+    reference : list
+        The left upper corner of the bounding box of the header to which all
+        forms are shifted for each region.
+    lower, upper : int
+        The treshold for the mean of the pixels of the box.
+    classify : dict
+        The parameters to tell forms from other pages, see
+        `form.classify_page`.
+
+    Parameters
+    ----------
+    layout : object
+        The Layout instance of the survey.
+    reference : object
+        The scan of a form to get the reference corners of the header from, a
+        list of scans (see `survey.collect_sources`) whose first form is taken
+        like in `Survey`, or the corner itself as tuple.
+
+    Raises
+    ------
+    ValueError
+        If none of the scans for the reference is a form.
+    """
+    def __init__(self, layout, reference):
+        # copies, the questions of the layout belong to the caller
+        self.questions = []
+        for q in layout.questions:
+            q = copy.copy(q)
+            q.coords = [(x+layout.off_x, y+layout.off_y) for x, y in q.coords]
+            self.questions.append(q)
+
+        self.header = layout.header
+        self.search = layout.search
+        self.dpi, self.scan_dpi = layout.dpi, layout.scan_dpi
+        self.regions = layout.regions
+        self.lower, self.upper = layout.lower, layout.upper
+        self.classify = layout.classify
+
+        if isinstance(reference, tuple):
+            self.reference = [reference]*len(self.regions)
+            return
+
+        if isinstance(reference, list):
+            scans = collect_sources(reference)
+        else:
+            scans = [(None, reference)]
+
+        # the first form in each region, pages which are no forms are
+        # skipped like in Survey.align_form
+        self.reference = []
+        for region in self.regions:
+            for name, source in scans:
+                preview = open_preview(source, self.dpi, self.scan_dpi)
+                if classify_page(preview, self.header, region,
+                                 **self.classify) != "form":
+                    continue
+                form = Form(source, self.questions, self.header, name,
+                            dpi=self.dpi, scan_dpi=self.scan_dpi,
+                            region=region)
+                try:
+                    form.rotate()
+                    corner = form.get_left_upper_bbox_header()
+                except ValueError:
+                    continue
+                self.reference.append(corner)
+                break
+            else:
+                raise ValueError("no form found to align the scans to")
+
+    def evaluate(self, scans):
+        """Find the answers of the forms.
+
+        Parameters
+        ----------
+        scans : iterable
+            The sources of the forms, see `survey.collect_sources`.
+
+        Returns
+        -------
+        list
+            A dictionary for each form (each region of each scan) in the given
+            order with the name of the form, the answer to each question and
+            the errors for the questions. For a page which is not a form, the
+            dictionary holds its name and the kind of the page as "rejected".
+        """
+        scans = collect_sources(scans)
+        survey = Survey(scans, self.questions, self.header,
+                        lower=self.lower, upper=self.upper,
+                        reference=list(self.reference), verbose=False,
+                        search=self.search, dpi=self.dpi,
+                        scan_dpi=self.scan_dpi, regions=self.regions,
+                        classify=self.classify)
+        answers, errors = survey.get_answers()
+
+        results = []
+        rejected = iter(survey.rejected)
+        i = 0
+        for name, source in scans:
+            for region in self.regions:
+                form = survey.forms[i] if i < len(survey.forms) else None
+                if form is None or form.source is not source or \
+                        form.region != region:
+                    name, kind = next(rejected)
+                    results.append({"name": name, "rejected": kind})
+                    continue
+
+                results.append({
+                    "name": form.fn,
+                    "answers": {q.title: a
+                                for q, a in zip(self.questions, answers[i])},
+                    "errors": {self.questions[k].title: error
+                               for k, error in errors.get(i, {}).items()},
+                })
+                i += 1
+
+        return results
@@ -1,41 +1,201 @@
+from __future__ import division
+
 import numpy as np
-from PIL import Image, ImageDraw
+
+from .backend import get_backend
+
+
+def open_image(source, dpi=None, scan_dpi=None):
+    """Open the grayscale image of a form.
+
+    Parameters
+    ----------
+    source : str, bytes, file-like object, memoryview, array or ArchiveMember
+        A filename, the content of an image file (e.g. jpg) as bytes, a
+        1-dimensional memoryview, a file-like object or a member of an
+        archive (see `archive.ArchiveMember`), or the grayscale
+        pixels as 2-dimensional uint8 array or memoryview. C-contiguous pixel
+        data is wrapped without copying, so it must not be changed as long as
+        the form is used.
+    dpi : int, optional
+        The working resolution. Scans with a higher resolution are reduced,
+        see `backend.reduce_image`.
+    scan_dpi : int or str, optional
+        The resolution of the scan, see `backend.reduced_size`.
+
+    Returns
+    -------
+    object
+        The image in the format of the backend, see `backend.get_backend`,
+        e.g. an Image instance in mode "L".
+    """
+    return get_backend().open(source, dpi, scan_dpi)
+
+
+def classify_page(preview, header, region=None, tresh=60, blank=0.001,
+                  coverage=0.5, factor=4):
+    """Tell forms from blank pages and other pages cheaply.
+
+    The page is given as preview reduced by factor, see
+    `backend.open_preview`, so the page need not be decoded completely. A
+    line of one pixel darker than tresh is still darker than
+    255 - (255-tresh)/factor in the preview. A page with hardly any dark
+    pixels is blank. A page is only a form if the header contains a long
+    horizontal line like the upper edge of its rectangle. A few rows of the
+    header are combined to allow for the skew.
+
+    Parameters
+    ----------
+    preview : array
+        The uint8 pixels of the preview of the page.
+    header : tupel
+        The left, upper, right and lower pixel coordinate of the header.
+    region : tuple, optional
+        The region of the form on the page, see `Form`.
+    tresh : int, optional
+        All pixels lower than the treshold are supposed to be black.
+    blank : float, optional
+        The maximal fraction of dark pixels of a blank page.
+    coverage : float, optional
+        The minimal fraction of the width of the header covered by a line.
+        Lower it for forms whose rectangle is narrower than the header.
+    factor : int, optional
+        The reduction factor of the preview.
+
+    Returns
+    -------
+    str
+        "form", "blank" or "foreign".
+    """
+    if region is not None:
+        left, upper, right, lower = [int(c) // factor for c in region]
+        preview = preview[upper:lower, left:right]
+    dark = preview < 255 - (255-tresh)/factor
+
+    if dark.size == 0 or dark.mean() < blank:
+        return "blank"
+
+    left, upper, right, lower = [int(c) // factor for c in header]
+    head = dark[upper:lower, left:right]
+    rows = 32 // factor
+    if head.shape[0] < rows or head.shape[1] == 0:
+        return "foreign"
+
+    band = np.zeros((head.shape[0]-rows+1, head.shape[1]), dtype=bool)
+    for k in range(rows):
+        band |= head[k:k+band.shape[0]]
+    if band.mean(axis=1).max() < coverage:
+        return "foreign"
+
+    return "form"
 
 
-class Form:
+class Form(object):
     """Represents one form of a survey.
 
+    The image of the form can be released after the boxes were extracted, see
+    `release`. It is then reloaded from the source whenever it is accessed,
+    and the rotation and shift which were found are applied again.
+
     Attributes
     ----------
     fn : str
-        The filename of the image.
+        The filename of the image or the name of the form.
+    source : object
+        The source of the image, see `open_image`.
     questions : list
         The list of Question instances.
     header : tupel
         The left, upper, right and lower pixel coordinate of the header.
     img : object
-        The Image instance of the form.
+        The image of the form in the format of the backend, see
+        `backend.get_backend`.
     boxes : list
         The list of Box instances.
+    angle : float
+        The angle of the rotation to correct the skew.
+    offset : tuple
+        The shift of the image in x and y direction.
 
     Parameters
     ----------
-    fn : str
-        The filename of the image.
+    source : object
+        The filename of the image or another source, see `open_image`.
     questions : list
         The list of Question instances.
     header : tupel
         The left, upper, right and lower pixel coordinate of the header.
+    name : str, optional
+        The name of the form. Defaults to the filename or to "form".
+    img : object, optional
+        The image of the already aligned form, e.g. from a cache. The
+        angle and the offset should be set accordingly. By default the image
+        is loaded from the source.
+    dpi, scan_dpi : optional
+        The working resolution and the resolution of the scan, see
+        `open_image`.
+    region : tuple, optional
+        The left, upper, right and lower pixel coordinate of the form on the
+        scanned page, if a page contains several forms. The header and the
+        coordinates of the boxes are relative to the region.
 
     """
-    def __init__(self, fn, questions, header):
-        self.fn = fn
+    __slots__ = ("fn", "source", "questions", "header", "boxes", "angle",
+                 "offset", "dpi", "scan_dpi", "region", "_img")
+
+    def __init__(self, source, questions, header, name=None, img=None,
+                 dpi=None, scan_dpi=None, region=None):
+        if name is None:
+            name = source if isinstance(source, str) else "form"
+        self.fn = name
+        self.source = source
+        self.dpi, self.scan_dpi = dpi, scan_dpi
+        self.region = region
         self.questions = questions
         self.header = header
 
-        self.img = Image.open(fn).convert("L")
+        self.angle = 0
+        self.offset = (0, 0)
+        self._img = self.load_image() if img is None else img
         self.boxes = []
 
+    @property
+    def img(self):
+        """The image of the form, reloaded if it was released."""
+        if self._img is None:
+            return self.load_image()
+        return self._img
+
+    def load_image(self):
+        """Load the image and apply the rotation and shift of the form.
+
+        Returns
+        -------
+        object
+            The image of the form.
+        """
+        backend = get_backend()
+        img = backend.open(self.source, self.dpi, self.scan_dpi)
+        if self.region is not None:
+            img = backend.crop(img, self.region)
+        if self.angle:
+            img = backend.rotate(img, self.angle)
+        if self.offset != (0, 0):
+            img = backend.translate(img, *self.offset)
+        return img
+
+    def release(self):
+        """Drop the image of the form to save memory.
+
+        The boxes keep their data. The image is reloaded on demand, e.g. to
+        mark the positions of the boxes.
+        """
+        self._img = None
+
+    def num_boxes(self):
+        """Get the number of boxes of all questions."""
+        return sum(len(q.coords) for q in self.questions)
+
     def rotate(self, tresh=60, method="rect"):
         """Rotate the form to correct the skew after scanning
 
@@ -60,6 +220,8 @@ class Form:
 
             data = np.where(data < tresh, 1, 0)
             y, x = np.nonzero(data)
+            if len(y) == 0:
+                raise ValueError("no header found in {}".format(self.fn))
 
             data = data[y.min():y.max()+1, x.min():x.max()+1]
             width = data.shape[1]
@@ -68,10 +230,14 @@ class Form:
 
             if p1[0] < width/2:
                 y, x = np.nonzero(data[:20, -10:])
+                if len(y) == 0:
+                    raise ValueError("no header found in {}".format(self.fn))
                 p2 = width-10+x[0], y[0]
             else:
                 p2 = p1
                 y, x = np.nonzero(data[:20, :10])
+                if len(y) == 0:
+                    raise ValueError("no header found in {}".format(self.fn))
                 p1 = x[0], y[0]
 
             angle = np.arctan2(p2[1]-p1[1], p2[0]-p1[0])*180/np.pi
@@ -80,10 +246,12 @@ class Form:
             raise NotImplementedError("method not implemented")
 
         # rotate
-        self.img = self.img.rotate(angle)
+        self.angle = angle
+        self._img = get_backend().rotate(self.img, angle)
 
     def get_header_data(self):
-        return np.array(self.img.crop(self.header))
+        backend = get_backend()
+        return np.array(backend.array(backend.crop(self.img, self.header)))
 
     def get_left_upper_bbox_header(self, tresh=40):
         """Get the left upper coordinate of the bounding box of the header
@@ -95,6 +263,8 @@ class Form:
         """
         data = self.get_header_data()
         crop = np.where(data > tresh, 0, 1)
+        if not crop.any():
+            raise ValueError("no header found in {}".format(self.fn))
 
         left = np.where(np.any(crop, axis=0))[0][0]
         upper = np.where(np.any(crop, axis=1))[0][0]
@@ -114,13 +284,33 @@ class Form:
             the header to which the one of this form is aligned.
         """
         left, upper = self.get_left_upper_bbox_header()
-        self.img = self.img.transform(
-                        self.img.size, Image.AFFINE,
-                        (1, 0, left-left_h, 0, 1, upper-upper_h))
+        self.offset = (left-left_h, upper-upper_h)
+        self._img = get_backend().translate(self.img, left-left_h,
+                                            upper-upper_h)
+
+    def init_questions(self, out=None, exterior=None):
+        """Create all boxes for the questions of this form
+
+        Parameters
+        ----------
+        out : array, shape(num_boxes(), Box.length, Box.length), optional
+            The uint8 buffer for the pixels of all boxes of the form.
+        exterior : int, optional
+            The length of the exterior box in which the corner of each box is
+            searched, see `Box`.
+        """
+        img = self.img
+        if out is None:
+            self.boxes = [q.generate_boxes(img, exterior=exterior)
+                          for q in self.questions]
+            return
 
-    def init_questions(self):
-        """Create all boxes for the questions of this form"""
-        self.boxes = [q.generate_boxes(self.img) for q in self.questions]
+        self.boxes = []
+        start = 0
+        for q in self.questions:
+            end = start + len(q.coords)
+            self.boxes.append(q.generate_boxes(img, out[start:end], exterior))
+            start = end
 
     def check_positions(self, original=False):
         """Mark all positions of the boxes and the header in the image.
@@ -133,13 +323,12 @@ class Form:
         Returns
         -------
         object
-            The copy of the Image instance where all boxes and the header are
-            marked as rectangles.
+            The copy of the image where all boxes and the header are marked as
+            rectangles.
         """
-        img = self.img.copy()
-
-        draw = ImageDraw.Draw(img)
-        draw.rectangle(self.header, outline=0)
+        backend = get_backend()
+        img = backend.copy(self.img)
+        backend.rectangle(img, self.header, 0)
 
         for boxes in self.boxes:
             for b in boxes:
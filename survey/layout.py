@@ -0,0 +1,224 @@
+from __future__ import division
+
+import json
+import os
+from collections import OrderedDict
+
+from .question import Question, YesNoQuestion
+
+
+# parsed layout files, maps the absolute path to the modification time and
+# the content of the file
+_cache = {}
+
+
+class Layout(object):
+    """The layout of the forms of a survey.
+
+    The layout is declared in a JSON file, e.g.
+
+        {
+            "directory": "Scans",
+            "csv": "results.csv",
+            "unit": "px",
+            "resolution": 200,
+            "dpi": 200,
+            "scan_dpi": "auto",
+            "backend": "auto",
+            "header": [230, 330, 1510, 470],
+            "offset": [0, -4],
+            "scale": 1.0,
+            "search": 34,
+            "regions": [[0, 0, 1654, 2339]],
+            "bounds": [120, 210],
+            "classify": {"coverage": 0.4},
+            "crosstabs": [["Erstsemester", "CAS"]],
+            "questions": [
+                {"title": "CAS", "coords": [[996, 595], [1081, 595]]},
+                {"title": "Vorbereitung",
+                 "answers": ["Brueckenkurs", "sonstige"],
+                 "coords": [[995, 642], [995, 691]],
+                 "multiple": true}
+            ]
+        }
+
+    A question without answers is a YesNoQuestion.
+
+    All lengths and coordinates are given in "unit", which is "px" (pixels at
+    "resolution" dpi, default 200) or "mm". They are converted to pixels at
+    the working resolution "dpi" (default 200), see `Box.set_resolution`.
+    Scans with a higher resolution "scan_dpi" are reduced while decoding, see
+    `form.open_image`; "auto" derives it from the width of an A4 page.
+    "backend" chooses the library for the image operations, see
+    `backend.set_backend`.
+
+    The coordinates of the boxes are scaled by "scale" with respect to the
+    left upper corner of the header. "search" is the length of the exterior
+    box in which the corner of each box is searched, see `Box`. Offset, scale
+    and search can be found by `calibrate.calibrate`.
+
+    "classify" holds the parameters "tresh", "blank" and "coverage" to tell
+    forms from blank and other pages, see `form.classify_page`. E.g. a lower
+    "coverage" accepts forms whose rectangle is narrower than half of the
+    header, and {"coverage": 0, "blank": 0} accepts every page.
+
+    A scanned page may contain several forms, e.g. two A5 forms on an A4
+    page. Then "regions" gives the left, upper, right and lower coordinate of
+    each form on the page, and the header and the boxes are given relative to
+    the left upper corner of a region.
+
+    Attributes
+    ----------
+    directory : str or list
+        The directory where the images (jpg) are stored, a zip or tar archive
+        of them or a list of directories and archives, see
+        `survey.collect_sources`.
+    csv_fn : str
+        The filename of the csv file for the answers.
+    unit : str
+        The unit of the lengths in the file, "px" or "mm".
+    dpi : int
+        The working resolution. All pixel values are given for it.
+    scan_dpi : int or str
+        The resolution of the scans, "auto" or None to keep the scans.
+    backend : str
+        The backend for the image operations, "pil", "opencv" or "auto".
+    header : tupel
+        The left, upper, right and lower pixel coordinate of the header.
+    off_x, off_y : int
+        The offset in x and y direction to adjust the position of the boxes.
+    scale : float
+        The scale of the coordinates of the boxes.
+    search : int
+        The length of the exterior box to search the corner of a box or None
+        for the default.
+    regions : list
+        The left, upper, right and lower pixel coordinate of each form on a
+        page, or [None] if a page is one form.
+    lower, upper : int
+        The treshold for the mean of the pixels of the box.
+    classify : dict
+        The parameters to tell forms from other pages, see
+        `form.classify_page`.
+    questions : list
+        The list of Question instances.
+    crosstabs : list
+        Pairs of titles of questions which are plotted against each other in
+        the report.
+
+    Parameters
+    ----------
+    data : dict
+        The content of the layout file.
+    """
+    def __init__(self, data):
+        self.directory = data.get("directory", "Scans")
+        self.csv_fn = data.get("csv", "results.csv")
+        self.unit = data.get("unit", "px")
+        self.dpi = data.get("dpi", 200)
+        self.scan_dpi = data.get("scan_dpi")
+        self.backend = data.get("backend", "pil")
+        if self.unit == "px":
+            self.factor = self.dpi / data.get("resolution", 200)
+        elif self.unit == "mm":
+            self.factor = self.dpi / 25.4
+        else:
+            raise ValueError("unknown unit {}".format(self.unit))
+
+        self.header = tuple(self.to_px(v) for v in data["header"])
+        off_x, off_y = data.get("offset", (0, 0))
+        self.off_x, self.off_y = self.to_px(off_x), self.to_px(off_y)
+        self.scale = data.get("scale", 1.0)
+        self.search = data.get("search")
+        if self.search is not None:
+            self.search = self.to_px(self.search)
+        self.regions = [None]
+        if "regions" in data:
+            self.regions = [tuple(self.to_px(v) for v in region)
+                            for region in data["regions"]]
+        self.lower, self.upper = data.get("bounds", (115, 208))
+        self.classify = dict(data.get("classify", {}))
+        unknown = set(self.classify) - {"tresh", "blank", "coverage"}
+        if unknown:
+            raise ValueError("unknown parameters of classify: {}".format(
+                ", ".join(sorted(unknown))))
+        self.crosstabs = [tuple(pair) for pair in data.get("crosstabs", [])]
+
+        left, upper = data["header"][:2]
+        self.questions = []
+        for q in data["questions"]:
+            coords = [(self.to_px(left + self.scale*(x-left)),
+                       self.to_px(upper + self.scale*(y-upper)))
+                      for x, y in q["coords"]]
+            if "answers" in q:
+                self.questions.append(Question(q["title"], q["answers"],
+                                               coords,
+                                               q.get("multiple", False)))
+            else:
+                self.questions.append(YesNoQuestion(q["title"], coords))
+
+    def to_px(self, value):
+        """Convert a length of the layout file to pixels."""
+        return int(round(value*self.factor))
+
+    def to_unit(self, px):
+        """Convert a length in pixels to the unit of the layout file."""
+        if self.unit == "px":
+            return int(round(px/self.factor))
+        return round(px/self.factor, 2)
+
+
+def load_layout(fn):
+    """Read the layout of the forms from a JSON file.
+
+    The file is parsed only once and cached until it is modified. Every call
+    creates new Question instances, so the caller may change them.
+
+    Parameters
+    ----------
+    fn : str
+        The filename of the layout.
+
+    Returns
+    -------
+    object
+        The Layout instance.
+    """
+    path = os.path.abspath(fn)
+    mtime = os.path.getmtime(path)
+
+    if path not in _cache or _cache[path][0] != mtime:
+        with open(path) as f:
+            _cache[path] = mtime, json.load(f)
+
+    return Layout(_cache[path][1])
+
+
+def update_layout(fn, **values):
+    """Change some values of a layout file.
+
+    The top level values are written one per line and the questions one per
+    line, like the layout file of the repository.
+
+    Parameters
+    ----------
+    fn : str
+        The filename of the layout.
+    values : dict
+        The new top level values, e.g. offset=[0, -4].
+    """
+    with open(fn) as f:
+        data = json.load(f, object_pairs_hook=OrderedDict)
+    data.update(values)
+
+    lines = []
+    for key, value in data.items():
+        if key == "questions":
+            lines.append('    "questions": [\n{}\n    ]'.format(
+                ",\n".join("        " + json.dumps(q) for q in value)))
+        else:
+            lines.append("    {}: {}".format(json.dumps(key),
+                                             json.dumps(value)))
+
+    with open(fn, "w") as f:
+        f.write("{\n" + ",\n".join(lines) + "\n}\n")
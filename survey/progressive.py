@@ -0,0 +1,119 @@
+from __future__ import division
+
+import random
+
+import numpy as np
+
+from .evaluator import Evaluator
+from .survey import collect_sources
+
+
+def wilson(k, n, total=None, z=1.96):
+    """Compute the Wilson confidence interval of a proportion.
+
+    Parameters
+    ----------
+    k, n : int or array
+        The number of hits and the sample size.
+    total : int, optional
+        The size of the population. The sample is supposed to be drawn
+        without replacement, so the interval is reduced by the finite
+        population correction and is the exact proportion if the whole
+        population is known.
+    z : float, optional
+        The quantile of the normal distribution, 1.96 for 95%.
+
+    Returns
+    -------
+    tuple
+        The lower and the upper bound.
+    """
+    p = k / n
+    center = (p + z*z/(2*n)) / (1 + z*z/n)
+    half = z*np.sqrt(p*(1-p)/n + z*z/(4*n*n)) / (1 + z*z/n)
+    low, high = center-half, center+half
+
+    if total is not None:
+        # shrink the interval towards the proportion of the sample
+        f = np.sqrt((total-n) / max(total-1, 1))
+        low, high = p - f*(p-low), p + f*(high-p)
+
+    return np.maximum(low, 0), np.minimum(high, 1)
+
+
+def progressive_statistics(layout, scans=None, batch_size=20, precision=None,
+                           z=1.96, seed=None):
+    """Compute the statistics of a survey from a growing random sample.
+
+    The forms are processed in random order. After each batch the proportion
+    of each answer is given with its confidence interval. The intervals
+    shrink to the exact result when all forms are processed.
+
+    Parameters
+    ----------
+    layout : object
+        The Layout instance of the survey.
+    scans : str or iterable, optional
+        The scans, see `survey.collect_sources`. Defaults to the directory of
+        the layout.
+    batch_size : int, optional
+        The number of forms of a batch.
+    precision : float, optional
+        Stop as soon as all intervals are at most twice as wide. By default
+        all forms are processed.
+    z : float, optional
+        The quantile of the normal distribution for the intervals.
+    seed : int, optional
+        The seed for the random order.
+
+    Yields
+    ------
+    tuple
+        The number of processed forms, the number of all forms (the pages
+        which are known to be no forms are not counted) and a list like
+        `Survey.statistics`, but the dictionary maps each answer to a tuple of
+        the proportion and the lower and upper bound of its interval.
+    """
+    sources = collect_sources(layout.directory if scans is None else scans)
+    if not sources:
+        return
+
+    # all forms are aligned to the first one like in the whole survey
+    evaluator = Evaluator(layout, sources)
+    titles = [q.title for q in evaluator.questions]
+    counts = [dict.fromkeys(list(q.answers) + [""], 0)
+              for q in evaluator.questions]
+
+    order = list(range(len(sources)))
+    random.Random(seed).shuffle(order)
+
+    # pages which are no forms do not belong to the population
+    n = 0
+    total = len(sources)*len(layout.regions)
+    for start in range(0, len(order), batch_size):
+        batch = [sources[i] for i in order[start:start+batch_size]]
+        for result in evaluator.evaluate(batch):
+            if "rejected" in result:
+                total -= 1
+                continue
+            for title, counter in zip(titles, counts):
+                for a in result["answers"][title].split(","):
+                    counter[a.strip()] = counter.get(a.strip(), 0) + 1
+            n += 1
+        if n == 0:
+            continue
+
+        stats = []
+        width = 0
+        for title, counter in zip(titles, counts):
+            k = np.array(list(counter.values()))
+            low, high = wilson(k, n, total, z)
+            width = max(width, np.max(high-low))
+            stats.append((title, {a: (c/n, float(lo), float(hi))
+                                  for (a, c), lo, hi
+                                  in zip(counter.items(), low, high)}))
+
+        yield n, total, stats
+
+        if precision is not None and width <= 2*precision:
+            break
@@ -34,20 +34,30 @@ class Question:
         self.coords = coords
         self.multiple = multiple
 
-    def generate_boxes(self, img):
+    def generate_boxes(self, img, out=None, exterior=None):
         """"Create the boxes for the question in a form.
 
         Parameters
         ----------
         img : object
             The Image instance of the form.
+        out : array, shape(len(coords), Box.length, Box.length), optional
+            The uint8 buffer for the pixels of the boxes.
+        exterior : int, optional
+            The length of the exterior box in which the corner of each box is
+            searched, see `Box`.
 
         Returns
         -------
         list of Box instance
             The boxes of the question in a form.
         """
-        return [Box(left, top, img) for (left, top) in self.coords]
+        if out is None:
+            return [Box(left, top, img, exterior=exterior)
+                    for (left, top) in self.coords]
+
+        return [Box(left, top, img, out[i], exterior)
+                for i, (left, top) in enumerate(self.coords)]
 
     def get_answers(self, boxes, lower, upper, full=False):
         """Identify the answers to the question.
@@ -75,16 +85,37 @@ class Question:
             of the question according to the parameter full. And the second
             element is the error message if something is not correct.
         """
+        means = np.array([b.mean() for b in boxes])
+        medians = np.array([np.median(b.data) for b in boxes])
+
+        return self.classify(means, medians, lower, upper, full)
+
+    def classify(self, means, medians, lower, upper, full=False):
+        """Identify the answers to the question from the pixels statistics.
+
+        Does the same as `get_answers` but for precomputed means and medians
+        of the boxes, e.g. computed for all boxes of a survey at once.
+
+        Parameters
+        ----------
+        means, medians : array, shape(len(coords),)
+            The mean and the median of the pixels of each box.
+        lower, upper : int
+            The treshold for the mean of the pixels of the box.
+        full : boolean, optional
+            If true, the status of every box of the question is returned.
+            Otherwise only the answer is given.
+
+        Returns
+        -------
+        tuple of lists
+            The answer and the error message, see `get_answers`.
+        """
         n = len(self.coords)
         answers = [False]*n
         error = ""
-        means = np.zeros(n)
-        medians = np.zeros(n)
 
-        for i, b in enumerate(boxes):
-            mean = b.mean()
-            means[i] = mean
-            medians[i] = np.median(b.data)
+        for i, mean in enumerate(means):
             if lower < mean and mean < upper:
                 answers[i] = True
 
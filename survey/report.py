@@ -0,0 +1,165 @@
+import csv
+import hashlib
+import json
+import os
+from collections import Counter
+from multiprocessing import Pool
+
+from .statistic import create_barplot, write_tex
+
+
+def crosstab(answers, questions, first, second):
+    """Count the combinations of the answers to two questions.
+
+    Parameters
+    ----------
+    answers : list
+        The answers to each question for each form.
+    questions : list
+        The titles of the questions.
+    first, second : str
+        The titles of the two questions.
+
+    Returns
+    -------
+    list
+        A list of tuples like the statistics of a survey. The title of each
+        tuple is an answer to the first question and the dictionary counts the
+        answers to the second question of these forms.
+
+    Raises
+    ------
+    ValueError
+        If a title is not one of the questions.
+    """
+    unknown = [t for t in (first, second) if t not in questions]
+    if unknown:
+        raise ValueError("unknown questions for a crosstab: {}".format(
+            ", ".join(unknown)))
+    i, k = questions.index(first), questions.index(second)
+
+    counter = Counter()
+    for form in answers:
+        for a in form[i].split(","):
+            for b in form[k].split(","):
+                counter[a.strip(), b.strip()] += 1
+
+    first_answers = sorted(set(a for a, b in counter))
+    second_answers = sorted(set(b for a, b in counter))
+
+    return [("{}: {}".format(first, a if a else "keine Angabe"),
+             {b: counter[a, b] for b in second_answers})
+            for a in first_answers]
+
+
+def read_answers(fn):
+    """Read the answers from the csv file of a survey.
+
+    Parameters
+    ----------
+    fn : str
+        The name of the csv file, see `Survey.write_answers_to_csv`.
+
+    Returns
+    -------
+    tuple
+        The titles of the questions and the answers of each form which is not
+        a duplicate.
+    """
+    with open(fn) as csvfile:
+        rows = list(csv.reader(csvfile))
+
+    header, rows = rows[0], rows[1:]
+    if header[0] == "form":
+        header = header[1:]
+        rows = [row[1:] for row in rows]
+    if header[-1] == "duplicate of":
+        header = header[:-1]
+        rows = [row[:-1] for row in rows if not row[-1]]
+
+    return header, rows
+
+
+def render(job):
+    """Create the plot of a job in a worker process."""
+    data, fn = job
+    create_barplot(data, fn)
+    return fn
+
+
+def write_report(stats, answers, directory, crosstabs=(), processes=None):
+    """Write the data and the plots for the LaTeX report.
+
+    The statistics are written as TeX macros to data.tex, see `write_tex`.
+    The plots for every question and for every pair of questions in crosstabs
+    are rendered to the directory plots in a process pool with the Agg
+    backend. A plot is only rendered again if its data changed: the hashes of
+    the data are kept in plots/manifest.json.
+
+    Parameters
+    ----------
+    stats : list
+        The statistics of the survey, see `Survey.statistics`.
+    answers : list
+        The answers to each question for each form which is counted.
+    directory : str
+        The directory of the report.
+    crosstabs : list, optional
+        Pairs of titles of questions to plot against each other.
+    processes : int, optional
+        The number of processes. Defaults to the number of cpus.
+
+    Returns
+    -------
+    list
+        The filenames of the files which were written.
+
+    Raises
+    ------
+    ValueError
+        If a crosstab refers to an unknown question, see `crosstab`.
+    """
+    titles = [title for title, counter in stats]
+    jobs = [([(title, counter)], "q{:02d}.pdf".format(k))
+            for k, (title, counter) in enumerate(stats)]
+    for first, second in crosstabs:
+        jobs.append((crosstab(answers, titles, first, second),
+                     "{}_{}.pdf".format(first, second).replace(" ", "")))
+
+    plot_dir = os.path.join(directory, "plots")
+    if not os.path.isdir(plot_dir):
+        os.makedirs(plot_dir)
+
+    written = []
+    fn = os.path.join(directory, "data.tex")
+    if write_tex(stats, fn):
+        written.append(fn)
+
+    manifest_fn = os.path.join(plot_dir, "manifest.json")
+    manifest = {}
+    if os.path.isfile(manifest_fn):
+        with open(manifest_fn) as f:
+            manifest = json.load(f)
+
+    todo = []
+    hashes = {}
+    for data, name in jobs:
+        fn = os.path.join(plot_dir, name)
+        h = hashlib.sha1(json.dumps(data, sort_keys=True).encode("utf-8"))
+        hashes[name] = h.hexdigest()
+        if manifest.get(name) != hashes[name] or not os.path.isfile(fn):
+            todo.append((data, fn))
+
+    if len(todo) > 1:
+        pool = Pool(processes)
+        written += pool.map(render, todo)
+        pool.close()
+        pool.join()
+    else:
+        written += [render(job) for job in todo]
+
+    manifest.update(hashes)
+    with open(manifest_fn, "w") as f:
+        json.dump(manifest, f, indent=0, sort_keys=True)
+
+    return written
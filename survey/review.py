@@ -0,0 +1,222 @@
+from __future__ import division
+
+import os
+from multiprocessing.pool import ThreadPool
+
+import numpy as np
+from PIL import Image
+
+try:
+    from html import escape
+except ImportError:  # python 2
+    from cgi import escape
+
+
+STYLE = ("body {font-family:sans-serif;} "
+         "div.form {margin-bottom:1em;} "
+         "a {color:green;} "
+         "span.err {color:red;} "
+         "span.warn {color:orange;} "
+         "img {vertical-align:middle; margin-left:1em;} "
+         "ul {margin:0;} ")
+
+
+def severity(error):
+    """Rate an error of a question.
+
+    Parameters
+    ----------
+    error : str
+        The error message, see `Question.classify`.
+
+    Returns
+    -------
+    int
+        1 for warnings (a decision was made) and 2 for errors.
+    """
+    return 1 if error.startswith("(warn)") else 2
+
+
+def describe(error):
+    """Get a short description of an error of a question."""
+    if error.startswith("(warn)"):
+        return "multiple boxes marked"
+    return "no boxes marked"
+
+
+def link(name):
+    """Get the html link to the scan of a form.
+
+    Forms which are no files, e.g. members of an archive, are not linked.
+
+    Parameters
+    ----------
+    name : str
+        The name of the form, see `Form`. A region of a page is marked by
+        "#" and its number.
+
+    Returns
+    -------
+    str
+        The link or the escaped name.
+    """
+    fn = name.partition("#")[0]
+    if not os.path.isfile(fn):
+        return escape(name)
+    return '<a href="{}" target="_blank">{}</a>'.format(
+        escape(os.path.abspath(fn)), escape(name))
+
+
+def save_crop(data, fn, scale=2, gap=4):
+    """Save the boxes of a question side by side as PNG.
+
+    Parameters
+    ----------
+    data : array, shape(n, Box.length, Box.length)
+        The pixels of the boxes.
+    fn : str
+        The filename of the image.
+    scale : int, optional
+        The boxes are enlarged by this factor.
+    gap : int, optional
+        The number of white pixels between two boxes.
+    """
+    n, height, width = data.shape
+    img = 255*np.ones((height, n*(width+gap)-gap), dtype=np.uint8)
+    for i, box in enumerate(data):
+        img[:, i*(width+gap):i*(width+gap)+width] = box
+
+    img = Image.fromarray(img)
+    img.resize((img.size[0]*scale, img.size[1]*scale)).save(fn)
+
+
+def clear_log(directory):
+    """Remove the pages and the crops of an earlier review log.
+
+    Only the files which `write_review_log` writes are removed, so a rerun
+    with fewer flagged forms leaves no stale pages behind.
+
+    Parameters
+    ----------
+    directory : str
+        The directory of the log.
+    """
+    crop_dir = os.path.join(directory, "crops")
+    for f in os.listdir(crop_dir):
+        if f.startswith("form") and f.endswith(".png"):
+            os.unlink(os.path.join(crop_dir, f))
+
+    for f in os.listdir(directory):
+        if f.startswith("page") and f.endswith(".html"):
+            os.unlink(os.path.join(directory, f))
+
+
+def write_review_log(survey, errors, directory, per_page=50, processes=4):
+    """Write a paginated html log of the forms which need a review.
+
+    Only forms with errors or duplicates are listed, the most severe first.
+    The pages which were skipped as they are no forms are listed on the
+    index.
+    Every entry shows small crops of the boxes of the affected questions,
+    taken from the box data of the survey. The crops are created in parallel
+    and only for the listed questions. The pages and crops of an earlier log
+    in the directory are removed first, see `clear_log`.
+
+    Parameters
+    ----------
+    survey : object
+        The Survey instance.
+    errors : dict
+        The errors of the forms, see `Survey.get_answers`.
+    directory : str
+        The directory of the log. It contains index.html, the pages and the
+        crops.
+    per_page : int, optional
+        The number of forms per page.
+    processes : int, optional
+        The number of threads to create the crops.
+
+    Returns
+    -------
+    int
+        The number of forms in the log.
+    """
+    crop_dir = os.path.join(directory, "crops")
+    if not os.path.isdir(crop_dir):
+        os.makedirs(crop_dir)
+    clear_log(directory)
+
+    duplicates = survey.duplicates or {}
+    flagged = set(errors) | set(duplicates)
+    rating = {i: sum(severity(e) for e in errors.get(i, {}).values()) +
+              (3 if i in duplicates else 0) for i in flagged}
+    flagged = sorted(flagged, key=lambda i: (-rating[i], i))
+
+    # index of the first box of each question
+    starts = np.cumsum([0] + [len(q.coords) for q in survey.questions])
+    means, _ = survey.box_statistics()
+
+    crops = []
+    pages = [flagged[k:k+per_page] for k in range(0, len(flagged), per_page)]
+    for p, page in enumerate(pages):
+        fn = os.path.join(directory, "page{:03d}.html".format(p+1))
+        with open(fn, "w") as html:
+            html.write("<html><head><title>Review {} / {}</title><style>{}"
+                       "</style></head><body>".format(p+1, len(pages), STYLE))
+            html.write('<p><a href="index.html">index</a></p>')
+
+            for i in page:
+                form = survey.forms[i]
+                html.write('<div class="form">{} (form {})<ul>'.format(
+                    link(form.fn), i))
+
+                if i in duplicates:
+                    html.write(
+                        '<li><span class="err">duplicate of {}</span> - not '
+                        'counted in the statistics</li>'.format(
+                            escape(survey.forms[duplicates[i]].fn)))
+
+                for k, error in sorted(errors.get(i, {}).items()):
+                    start, end = starts[k], starts[k+1]
+                    crop = "form{:04d}_q{:02d}.png".format(i, k)
+                    crops.append((survey.box_data[i, start:end],
+                                  os.path.join(crop_dir, crop)))
+
+                    html.write(
+                        '<li>{}: <span class="{}">{}</span> (means {})'
+                        '<img src="crops/{}"></li>'.format(
+                            escape(survey.questions[k].title),
+                            "warn" if severity(error) == 1 else "err",
+                            describe(error),
+                            ", ".join("{:.0f}".format(m)
+                                      for m in means[i, start:end]),
+                            crop))
+                html.write("</ul></div>")
+            html.write("</body></html>")
+
+    with open(os.path.join(directory, "index.html"), "w") as html:
+        html.write("<html><head><title>Review</title><style>{}</style>"
+                   "</head><body>".format(STYLE))
+        html.write("<p>{} of {} forms need a review.</p><ul>".format(
+            len(flagged), len(survey.forms)))
+        for p, page in enumerate(pages):
+            html.write('<li><a href="page{:03d}.html">page {}</a>: {}</li>'
+                       .format(p+1, p+1, ", ".join(
+                           escape(os.path.basename(survey.forms[i].fn))
+                           for i in page)))
+        html.write("</ul>")
+
+        if survey.rejected:
+            html.write("<p>{} pages were skipped.</p><ul>".format(
+                len(survey.rejected)))
+            for name, kind in survey.rejected:
+                html.write('<li>{}: <span class="warn">{} page</span></li>'
+                           .format(link(name), kind))
+            html.write("</ul>")
+        html.write("</body></html>")
+
+    pool = ThreadPool(processes)
+    pool.map(lambda args: save_crop(*args), crops)
+    pool.close()
+
+    return len(flagged)
@@ -0,0 +1,229 @@
+from __future__ import print_function
+
+import email.parser
+import email.policy
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from queue import Empty, Queue
+from socketserver import ThreadingMixIn
+from time import time
+
+from .survey import collect_sources
+
+
+class Batcher(threading.Thread):
+    """Group concurrent requests into small batches.
+
+    The first waiting request starts a batch. Further requests are added
+    until the batch contains `max_forms` forms or `max_wait` seconds passed.
+    The scans of the batch are evaluated by a pool of worker threads, which
+    decode and align them in parallel. Every scan is evaluated on its own, so
+    a request gets its results as soon as its own scans are done instead of
+    waiting for the whole batch.
+
+    Parameters
+    ----------
+    evaluator : object
+        The Evaluator instance, see `evaluator.Evaluator`.
+    max_forms : int, optional
+        The maximal number of forms of a batch.
+    max_wait : float, optional
+        The maximal time in seconds to wait for further requests.
+    workers : int, optional
+        The number of worker threads. Defaults to the number of cpus.
+    """
+    def __init__(self, evaluator, max_forms=16, max_wait=0.01, workers=None):
+        threading.Thread.__init__(self)
+        self.daemon = True
+
+        self.evaluator = evaluator
+        self.max_forms = max_forms
+        self.max_wait = max_wait
+        self.queue = Queue()
+        self.pool = ThreadPoolExecutor(workers or os.cpu_count() or 1)
+        self.lock = threading.Lock()
+
+    def submit(self, scans):
+        """Evaluate the forms in the next batch and wait for the results.
+
+        Parameters
+        ----------
+        scans : list
+            The list of tuples of the name and the source of each form.
+
+        Returns
+        -------
+        list
+            The results of the forms, see `evaluator.Evaluator.evaluate`.
+        """
+        job = {"scans": scans, "done": threading.Event()}
+        self.queue.put(job)
+        job["done"].wait()
+
+        if "error" in job:
+            raise job["error"]
+        return [result for results in job["results"] for result in results]
+
+    def run(self):
+        while True:
+            jobs = [self.queue.get()]
+            n = len(jobs[0]["scans"])
+            deadline = time() + self.max_wait
+
+            while n < self.max_forms:
+                timeout = deadline - time()
+                if timeout <= 0:
+                    break
+                try:
+                    job = self.queue.get(timeout=timeout)
+                except Empty:
+                    break
+                jobs.append(job)
+                n += len(job["scans"])
+
+            self.process(jobs)
+
+    def process(self, jobs):
+        """Hand out the scans of all jobs to the workers."""
+        for job in jobs:
+            job["results"] = [None]*len(job["scans"])
+            job["pending"] = len(job["scans"])
+            for i, scan in enumerate(job["scans"]):
+                self.pool.submit(self.evaluate, job, i, scan)
+
+    def evaluate(self, job, i, scan):
+        """Evaluate the i-th scan of a job in a worker.
+
+        The job is done when its last scan is evaluated. A broken scan only
+        affects its own request.
+        """
+        error = None
+        try:
+            results = self.evaluator.evaluate([scan])
+        except Exception as e:
+            error = ValueError("the scans can not be evaluated: {}".format(e))
+
+        with self.lock:
+            if error is not None:
+                job.setdefault("error", error)
+            else:
+                job["results"][i] = results
+            job["pending"] -= 1
+            done = job["pending"] == 0
+
+        if done:
+            job["done"].set()
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    """Handle requests to evaluate scans.
+
+    POST /evaluate takes a single image as body or several images as
+    multipart/form-data and returns the results as JSON. A body larger than
+    the `max_size` of the server is refused with status 413.
+    """
+    def do_GET(self):
+        if self.path == "/health":
+            self.send_json(200, {"status": "ok"})
+        else:
+            self.send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        if self.path != "/evaluate":
+            self.send_json(404, {"error": "not found"})
+            return
+
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+        except ValueError:
+            length = -1
+        if length < 0:
+            self.close_connection = True
+            self.send_json(400, {"error": "invalid Content-Length"})
+            return
+        if length > self.server.max_size:
+            self.close_connection = True
+            self.send_json(413, {"error": "the scans exceed {} bytes".format(
+                self.server.max_size)})
+            return
+
+        body = self.rfile.read(length)
+        content_type = self.headers.get("Content-Type", "")
+
+        if content_type.startswith("multipart/form-data"):
+            scans = self.parse_multipart(content_type, body)
+        else:
+            scans = [body] if body else []
+
+        if not scans:
+            self.send_json(400, {"error": "no scans given"})
+            return
+
+        try:
+            results = self.server.batcher.submit(collect_sources(scans))
+        except ValueError as e:
+            self.send_json(422, {"error": str(e)})
+            return
+
+        self.send_json(200, {"forms": results})
+
+    def parse_multipart(self, content_type, body):
+        """Get the images from a multipart/form-data body.
+
+        Returns
+        -------
+        list
+            The tuples of the filename and the bytes of each part.
+        """
+        header = "Content-Type: {}\r\n\r\n".format(content_type)
+        msg = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+            header.encode("latin-1") + body)
+
+        scans = []
+        for i, part in enumerate(msg.iter_parts()):
+            name = part.get_filename() or "form{:04d}".format(i+1)
+            scans.append((name, part.get_payload(decode=True)))
+
+        return scans
+
+    def send_json(self, status, data):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            BaseHTTPRequestHandler.log_message(self, format, *args)
+
+
+class Server(ThreadingMixIn, HTTPServer):
+    """HTTP server which evaluates scans with a warm layout.
+
+    Parameters
+    ----------
+    address : tuple
+        The host and the port.
+    evaluator : object
+        The Evaluator instance, see `evaluator.Evaluator`.
+    max_forms, max_wait, workers : optional
+        The parameters of the batches, see `Batcher`.
+    max_size : int, optional
+        The maximal size of the body of a request in bytes.
+    verbose : boolean, optional
+        Log every request.
+    """
+    daemon_threads = True
+
+    def __init__(self, address, evaluator, max_forms=16, max_wait=0.01,
+                 workers=None, max_size=64*2**20, verbose=True):
+        HTTPServer.__init__(self, address, RequestHandler)
+        self.max_size = max_size
+        self.verbose = verbose
+        self.batcher = Batcher(evaluator, max_forms, max_wait, workers)
+        self.batcher.start()
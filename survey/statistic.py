@@ -1,8 +1,33 @@
 import csv
-import matplotlib.pyplot as plt
+import os
+import sys
+
 import numpy as np
 
 
+def get_pyplot(headless=False):
+    """Import pyplot on demand.
+
+    Importing pyplot is expensive, so it is only done if something is plotted.
+
+    Parameters
+    ----------
+    headless : boolean, optional
+        Select the Agg backend which does not need a display. This has only an
+        effect if pyplot was not imported before.
+
+    Returns
+    -------
+    module
+        The matplotlib.pyplot module.
+    """
+    import matplotlib
+    if headless and "matplotlib.pyplot" not in sys.modules:
+        matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    return plt
+
+
 def transform(data):
     """Prepare the data for plotting
 
@@ -86,17 +111,32 @@ def write_tex(data, fn):
         [("Question1", {"yes":3, "no":4}, ("Question2", {"a":1, "no":2})]
     fn : str
         The name of the tex file.
+
+    Returns
+    -------
+    boolean
+        True if the file was written. An unchanged file is not touched, so
+        the LaTeX report is not rebuilt.
     """
+    lines = []
+    for title, answers in data:
+        for k, v in answers.items():
+            if not k:
+                k = "na"
+            lines.append("\\newcommand{{\\{}{}}}{{{}}}\n".format(
+                                                    title.replace(" ", ""),
+                                                    k.replace(" ", ""),
+                                                    v))
+    content = "".join(lines)
+
+    if os.path.isfile(fn):
+        with open(fn) as f:
+            if f.read() == content:
+                return False
 
     with open(fn, "w") as f:
-        for title, answers in data:
-            for k, v in answers.items():
-                if not k:
-                    k = "na"
-                f.write("\\newcommand{{\\{}{}}}{{{}}}\n".format(
-                                                        title.replace(" ", ""),
-                                                        k.replace(" ", ""),
-                                                        v))
+        f.write(content)
+    return True
 
 
 def create_barplot(data, fn=""):
@@ -113,6 +153,7 @@ def create_barplot(data, fn=""):
         The name of the filename. If the filename is present, the plot will be
         saved to the file. Otherwise the plot will be displayed.
     """
+    plt = get_pyplot(headless=bool(fn))
     questions, quantities = transform(data)
 
     colors = [plt.cm.Set1(x) for x in np.linspace(0, 1, 9)]
@@ -136,5 +177,6 @@ def create_barplot(data, fn=""):
 
     if fn:
         plt.savefig(fn)
+        plt.close(fig)
     else:
         plt.show()
@@ -7,7 +7,103 @@ import numpy as np
 from collections import Counter
 from time import time
 
-from .form import Form
+from .archive import ArchiveMember, archive_sources, is_archive
+from .backend import get_backend, open_preview
+from .box import Box
+from .cache import PageCache, box_bounds
+from .duplicate import find_duplicates
+from .form import Form, classify_page, open_image
+from .review import link, write_review_log
+
+
+def collect_sources(scans):
+    """Collect the images of the forms of a survey.
+
+    Parameters
+    ----------
+    scans : str or iterable
+        The directory where the images (jpg) are stored, a zip or tar archive
+        of the images or an iterable of sources, see `form.open_image`. An
+        item can also be a tuple of the name and the source of a form, or a
+        directory or an archive whose images are added. The images of an
+        archive are read without extracting it, see `archive.archive_sources`.
+
+    Returns
+    -------
+    list
+        A list of tuples of the name and the source of each form.
+    """
+    if isinstance(scans, str):
+        if is_archive(scans):
+            return archive_sources(scans)
+        files = [os.path.join(scans, f)
+                 for f in sorted(os.listdir(scans)) if f.endswith("jpg")]
+        return [(fn, fn) for fn in files if os.path.isfile(fn)]
+
+    sources = []
+    for i, source in enumerate(scans):
+        if isinstance(source, tuple):
+            sources.append(source)
+        elif isinstance(source, str) and (os.path.isdir(source) or
+                                          is_archive(source)):
+            sources.extend(collect_sources(source))
+        elif isinstance(source, str):
+            sources.append((source, source))
+        else:
+            sources.append(("form{:04d}".format(i+1), source))
+
+    return sources
+
+
+def select_questions(questions, titles):
+    """Get the questions with the given titles in the order of the survey.
+
+    Parameters
+    ----------
+    questions : list
+        The list of Question instances.
+    titles : list
+        The titles of the questions to select.
+
+    Returns
+    -------
+    list
+        The selected Question instances.
+    """
+    unknown = set(titles) - set(q.title for q in questions)
+    if unknown:
+        raise ValueError("unknown questions: {}".format(
+            ", ".join(sorted(unknown))))
+
+    return [q for q in questions if q.title in titles]
+
+
+def count_answers(questions, answers):
+    """Count how often each answer to the questions was given.
+
+    Parameters
+    ----------
+    questions : list
+        The list of Question instances.
+    answers : list
+        The answers to each question for each form, see `Survey.get_answers`.
+
+    Returns
+    -------
+    list
+        A list of tuples containing the title of the questions and the
+        number of each possible answer, "" for no answer.
+    """
+    data = []
+
+    for i, q in enumerate(questions):
+        ans_counter = {answer: 0 for answer in q.answers}
+        ans_counter[""] = 0  # no answer
+        ans = [a.strip() for form in answers for a in form[i].split(',')]
+        ans_counter.update(dict(Counter(ans)))
+        data.append((q.title, ans_counter))
+
+    return data
 
 
 class Survey:
@@ -22,6 +118,16 @@ class Survey:
         The list of Question instances for the survey.
     forms: list
         The list of Form instance for the survey.
+    box_data : array, shape(n_forms, n_boxes, Box.length, Box.length)
+        The uint8 pixels of all boxes of all forms. The boxes of the forms are
+        views into this array.
+    duplicates : dict
+        Maps the index of a form which is a second scan of a sheet to the
+        index of the first one, see `find_duplicates`. None until the
+        duplicates were searched.
+    rejected : list
+        The names of the scans which are not forms, together with their kind
+        "blank" or "foreign", see `form.classify_page`. They are skipped.
     lower, upper : int
         The treshold for the mean of the pixels of the box. If the mean is
         between the upper and lower bound the box should be checked
@@ -29,8 +135,10 @@ class Survey:
 
     Parameters
     ----------
-    directory : str
-        The directory where the images (jpg) are stored.
+    scans : str or iterable
+        The directory where the images (jpg) are stored, an archive of them
+        or an iterable of sources like bytes, file-like objects, uint8 arrays
+        or several directories and archives, see `collect_sources`.
     questions : list
         The list of Question instances for the survey.
     header : tupel
@@ -42,50 +150,229 @@ class Survey:
         The treshold for the mean of the pixels of the box. If the mean is
         between the upper and lower bound the box should be checked
         otherwise not.
+    keep_images : boolean, optional
+        If false, the images of the forms are released after the boxes were
+        extracted and are reloaded only if needed, e.g. for `check_positions`.
+    reference : tuple or list, optional
+        The left upper corner of the bounding box of the header to which all
+        forms are shifted, or a list of corners for each region. Defaults to
+        the one of the first form (in each region).
+    verbose : boolean, optional
+        Print the progress.
+    cache : str, optional
+        The directory of a cache for the aligned pages, see
+        `cache.PageCache`. If the scans and the header are unchanged and the
+        boxes stay in the stored region of the pages, the scans are not
+        decoded and aligned again.
+    search : int, optional
+        The length of the exterior box in which the corner of each box is
+        searched, see `Box`. A calibrated layout allows a smaller one.
+    dpi : int, optional
+        The working resolution of the coordinates. The lengths of the boxes
+        are scaled accordingly, see `Box.set_resolution`.
+    scan_dpi : int or str, optional
+        The resolution of the scans. Scans with a higher resolution than dpi
+        are reduced while decoding, see `form.open_image`.
+    select : list, optional
+        The titles of the questions to evaluate. Only the boxes of these
+        questions are extracted and classified. Together with a cache, the
+        scans are not even decoded again.
+    regions : list, optional
+        The left, upper, right and lower pixel coordinate of each form on a
+        scanned page, if a page contains several forms. Every region is
+        aligned on its own header and is a form of its own, named like
+        "page.jpg#2". A page is decoded only once for all regions.
+    classify : dict, optional
+        The parameters to tell forms from blank and other pages, see
+        `form.classify_page`.
     """
-    def __init__(self, directory, questions, header, offset_x=0, offset_y=0,
-                 lower=115, upper=208):
+    def __init__(self, scans, questions, header, offset_x=0, offset_y=0,
+                 lower=115, upper=208, keep_images=False, reference=None,
+                 verbose=True, cache=None, search=None, dpi=None,
+                 scan_dpi=None, select=None, regions=None, classify=None):
 
+        if select is not None:
+            questions = select_questions(questions, select)
         self.questions = questions
         if offset_x != 0 or offset_y != 0:
             self.transform_questions(offset_x, offset_y)
 
         self.lower, self.upper = lower, upper
 
+        self.dpi, self.scan_dpi = dpi, scan_dpi
+        self.classify = {} if classify is None else classify
+        self._page = self._preview = None
+        self._bounds = None
+        if dpi is not None:
+            Box.set_resolution(dpi)
+
         self.forms = []
+        self.duplicates = None
+        self.rejected = []
 
-        print("start init...")
+        log = sys.stdout if verbose else open(os.devnull, "w")
+        log.write("start init...\n")
         start = time()
 
-        i = 1
-        for f in sorted(os.listdir(directory)):
-            fn = os.path.join(directory, f)
-            if os.path.isfile(fn) and f.endswith("jpg"):
-                sys.stdout.write("\rrotate ...{:4d} ".format(i))
-                sys.stdout.flush()
-                i += 1
-
-                form = Form(fn, questions, header)
-                form.rotate()
+        sources = collect_sources(scans)
+        if cache is not None:
+            cache = PageCache(cache, header, (dpi, scan_dpi), self.classify)
+            self._bounds = box_bounds(questions, search)
+
+        if regions is None:
+            regions = [None]
+        if not isinstance(reference, list):
+            reference = [reference]*len(regions)
+
+        n_boxes = sum(len(q.coords) for q in questions)
+        self.box_data = np.empty((len(sources)*len(regions), n_boxes,
+                                  Box.length, Box.length), dtype=np.uint8)
+
+        for i, (name, source) in enumerate(sources):
+            log.write("\rprocess ...{:4d} ".format(i+1))
+            log.flush()
+
+            for k, region in enumerate(regions):
+                form_name = name
+                if len(regions) > 1:
+                    form_name = "{}#{}".format(name, k+1)
+                form, reference[k] = self.align_form(
+                    form_name, source, header, reference[k], cache, region)
+                if form is None:
+                    continue
+                form.init_questions(self.box_data[len(self.forms)], search)
+                if not keep_images:
+                    form.release()
                 self.forms.append(form)
-                # break
-        print("done")
+            self._page = self._preview = None
+        self.box_data = self.box_data[:len(self.forms)]
+        log.write("done\n")
 
-        # Get left upper corner of the bounding box of the header from the
-        # first form. Every form is shifted against this coordinates to get
-        # a good match of the boxes
-        form = self.forms[0]
-        left, upper = form.get_left_upper_bbox_header()
+        for name, kind in self.rejected:
+            log.write("skip {} ({} page)\n".format(name, kind))
+
+        log.write("init done ({:.2f}s)\n".format(time()-start))
+        if not verbose:
+            log.close()
+
+    def open_page(self, source, region=None):
+        """Decode a scan only once for all regions on the page.
+
+        Parameters
+        ----------
+        source : object
+            The source of the image, see `form.open_image`.
+        region : tuple, optional
+            The region of the form on the page, see `Form`.
+
+        Returns
+        -------
+        object
+            The image of the region.
+        """
+        if self._page is None or self._page[0] is not source:
+            self._page = source, open_image(source, self.dpi, self.scan_dpi)
+        img = self._page[1]
+        return img if region is None else get_backend().crop(img, region)
+
+    def open_preview(self, source):
+        """Decode the preview of a scan only once for all regions on the page.
+
+        See `backend.open_preview`.
+        """
+        if self._preview is None or self._preview[0] is not source:
+            self._preview = source, open_preview(source, self.dpi,
+                                                 self.scan_dpi)
+        return self._preview[1]
 
-        for i, form in enumerate(self.forms):
-            sys.stdout.write("\rshift  ...{:4d} ".format(i+1))
-            sys.stdout.flush()
+    def align_form(self, name, source, header, reference=None, cache=None,
+                   region=None):
+        """Create a form and correct its skew and shift.
 
-            form.shift(left, upper)
-            form.init_questions()
-        print("done")
+        Pages which are not forms are rejected from a preview before the page
+        is decoded, see `form.classify_page`, and added to `rejected`.
 
-        print("init done ({:.2f}s)".format(time()-start))
+        Parameters
+        ----------
+        name : str
+            The name of the form.
+        source : object
+            The source of the image, see `form.open_image`.
+        header : tupel
+            The left, upper, right and lower pixel coordinate of the header.
+        reference : tuple, optional
+            The left upper corner of the bounding box of the header to which
+            the form is shifted. Defaults to the one of this form.
+        cache : object, optional
+            The PageCache instance for the aligned pages.
+        region : tuple, optional
+            The region of the form on the page, see `Form`.
+
+        Returns
+        -------
+        tuple
+            The aligned Form instance, or None if the page was rejected, and
+            the reference corner.
+        """
+        form = None
+        alignment = None
+        if cache is not None:
+            key = cache.key(source, region)
+            kind = cache.get_kind(key)
+            if kind is not None and kind != "form":
+                self.rejected.append((name, kind))
+                return None, reference
+            alignment = cache.get_alignment(key)
+
+        if alignment is None:
+            kind = classify_page(self.open_preview(source), header, region,
+                                 **self.classify)
+            if kind == "form":
+                form = Form(source, self.questions, header, name,
+                            self.open_page(source, region), self.dpi,
+                            self.scan_dpi, region)
+                try:
+                    form.rotate()
+                    corner = form.get_left_upper_bbox_header()
+                except ValueError:
+                    kind = "foreign"
+            if kind != "form":
+                if cache is not None:
+                    cache.set_kind(key, kind)
+                self.rejected.append((name, kind))
+                return None, reference
+
+            angle = form.angle
+            if cache is not None:
+                cache.set_alignment(key, angle, corner)
+        else:
+            angle, corner = alignment
+
+        # Get left upper corner of the bounding box of the header from the
+        # first form. Every form is shifted against this coordinates to get a
+        # good match of the boxes
+        if reference is None:
+            reference = corner
+        offset = corner[0]-reference[0], corner[1]-reference[1]
+
+        if cache is not None and form is None:
+            img = cache.get_page(key, offset, self._bounds)
+            if img is not None:
+                form = Form(source, self.questions, header, name, img,
+                            self.dpi, self.scan_dpi, region)
+                form.angle, form.offset = angle, offset
+                return form, reference
+
+            form = Form(source, self.questions, header, name,
+                        self.open_page(source, region), self.dpi,
+                        self.scan_dpi, region)
+            form.rotate()
+
+        form.shift(*reference)
+        if cache is not None:
+            cache.set_page(key, offset, form.img, self._bounds)
+
+        return form, reference
 
     def transform_questions(self, offset_x, offset_y):
         """Transform the coordinates of the boxes of the questions.
@@ -111,17 +398,24 @@ class Survey:
             Use the orignal position of the center or the calculated.
         """
 
-        self.forms[i].check_positions(original).save(fn)
+        get_backend().save(self.forms[i].check_positions(original), fn)
 
     def check_all(self):
         """Mark the header and all boxes for each form and save the image.
-        Add a "check" to the filename and save as PNG.
+        Add a "check" to the filename and save as PNG. The images of forms
+        from an archive are saved next to the archive.
         """
 
         for form in self.forms:
-            fn = form.fn
-            fn = "{}_check.png".format(fn[:-4])
-            form.check_positions().save(fn)
+            fn, _, region = form.fn.partition("#")
+            if isinstance(form.source, ArchiveMember):
+                fn = "{}_{}".format(form.source.path,
+                                    os.path.basename(form.source.member))
+            fn = os.path.splitext(fn)[0]
+            if region:
+                fn = "{}_{}".format(fn, region)
+            get_backend().save(form.check_positions(),
+                               "{}_check.png".format(fn))
 
     def get_answers(self, full=False):
         """Get all answers of the forms.
@@ -141,29 +435,91 @@ class Survey:
         answers = []
         errors = {}
 
-        for i, form in enumerate(self.forms):
-            answ, err = form.get_answers(self.lower, self.upper, full)
+        means, medians = self.box_statistics()
+
+        for i in range(len(self.forms)):
+            answ = []
+            err = {}
+            start = 0
+            for k, q in enumerate(self.questions):
+                end = start + len(q.coords)
+                ans, error = q.classify(means[i, start:end],
+                                        medians[i, start:end],
+                                        self.lower, self.upper, full)
+                answ.append(ans)
+                if error:
+                    err[k] = error
+                start = end
+
             answers.append(answ)
             if err:
                 errors[i] = err
 
         return answers, errors
 
+    def box_statistics(self):
+        """Compute the mean and the median of the pixels of all boxes at once.
+
+        Returns
+        -------
+        tuple of arrays, shape(n_forms, n_boxes)
+            The means and the medians.
+        """
+        data = self.get_box_data()
+        means = data.mean(axis=1).reshape(self.box_data.shape[:2])
+        medians = np.median(data, axis=1).reshape(self.box_data.shape[:2])
+
+        return means, medians
+
+    def find_duplicates(self, tol=6):
+        """Find forms which were scanned twice.
+
+        The forms are compared by hashed signatures of their boxes, see
+        `duplicate.find_duplicates`. The result is stored in `duplicates`.
+
+        Parameters
+        ----------
+        tol : float, optional
+            The maximal difference of the means of a box for two scans of the
+            same sheet.
+
+        Returns
+        -------
+        dict
+            Maps the index of every duplicate to the index of the first form.
+        """
+        means, _ = self.box_statistics()
+        checked = (means > self.lower) & (means < self.upper)
+        self.duplicates = find_duplicates(means, checked, tol)
+
+        return self.duplicates
+
     def get_box_data(self):
         """Get all image data of the boxes."""
 
-        res = [b.data.flatten() for form in self.forms for boxes in form.boxes
-               for b in boxes]
-
-        return np.array(res)
+        return self.box_data.reshape(-1, Box.length*Box.length)
 
-    def write_answers_to_csv(self, fn, log=None):
+    def write_answers_to_csv(self, fn, log=None, duplicates=True):
         """Store the answers of the survey to a csv file.
 
+        The first column of the csv file contains the name of the form, e.g.
+        the filename or "archive:member". The last column contains the name
+        of the first scan for every form which was scanned twice, see
+        `find_duplicates`, which is called first if the duplicates were not
+        searched yet. Without the detection this column is left out.
+
         Parameters
         ----------
         fn : str
             The file name.
+        log : str, optional
+            The file name of the html log. If it does not end with ".html", a
+            paginated review log is written to this directory, see
+            `create_review_log`. Without log the errors are printed.
+        duplicates : boolean, optional
+            Detect forms which were scanned twice. This is not reliable for
+            a small selection of questions. Without the detection no form
+            is a duplicate, unless `find_duplicates` was called before.
 
         Returns
         -------
@@ -173,27 +529,63 @@ class Survey:
         """
 
         answers, errors = self.get_answers()
+        detect = duplicates
+        if self.duplicates is None:
+            self.duplicates = self.find_duplicates() if detect else {}
+        duplicates = self.duplicates
 
         with open(fn, "w") as csvfile:
             cw = csv.writer(csvfile)
             # header
-            cw.writerow([q.title for q in self.questions])
-
-            for answ in answers:
-                cw.writerow(answ)
+            header = ["form"] + [q.title for q in self.questions]
+            cw.writerow(header + ["duplicate of"] if detect else header)
+
+            for i, answ in enumerate(answers):
+                row = [self.forms[i].fn] + answ
+                if not detect:
+                    cw.writerow(row)
+                    continue
+                original = self.forms[duplicates[i]].fn \
+                    if i in duplicates else ""
+                cw.writerow(row + [original])
 
         if log is None:
+            for name, kind in self.rejected:
+                print("#"*60)
+                print("Skipped {}: {} page".format(name, kind))
+            for i, j in sorted(duplicates.items()):
+                print("#"*60)
+                print("Duplicate form {}: scan of the same sheet as form {}"
+                      .format(i, j))
             for i, errors in errors.items():
                 print("#"*60)
                 print("Error form {}:".format(i))
                 for k, error in errors.items():
                     print("Question <{}>: {}".format(self.questions[k].title,
                                                      error))
-        else:
+        elif log.endswith(".html"):
             self.create_html_log(errors, log)
+        else:
+            self.create_review_log(errors, log)
 
         return answers
 
+    def create_review_log(self, errors, directory, per_page=50):
+        """Write a paginated log of the forms with errors or duplicates.
+
+        See `review.write_review_log`.
+
+        Parameters
+        ----------
+        errors : dict
+            The errors of the forms, see `get_answers`.
+        directory : str
+            The directory of the log.
+        per_page : int, optional
+            The number of forms per page.
+        """
+        write_review_log(self, errors, directory, per_page)
+
     def create_html_log(self, errors, fn):
 
         with open(fn, "w") as html:
@@ -203,13 +595,19 @@ class Survey:
             html.write("p.err a{color:red;}")
             html.write("ul {margin:0;} ")
             html.write("</style></head><body>")
+            for name, kind in self.rejected:
+                html.write('<p class=err>{}</p><ul><li>Skipped: {} page'
+                           '</li></ul>'.format(link(name), kind))
             for i, form in enumerate(self.forms):
                 err = errors[i] if i in errors else None
-                cl = " class=err" if err else ""
-                html.write(
-                    '<p{}><a href="{}" target="_blank">'
-                    '{}</a></p>'.format(cl, form.fn, form.fn)
-                )
+                dup = (self.duplicates or {}).get(i)
+                cl = " class=err" if err or dup is not None else ""
+                html.write('<p{}>{}</p>'.format(cl, link(form.fn)))
+                if dup is not None:
+                    html.write(
+                        "<ul><li>Duplicate of {} - not counted in the "
+                        "statistics</li></ul>".format(self.forms[dup].fn)
+                    )
                 if err:
                     html.write("<ul>")
                     for k, error in err.items():
@@ -221,27 +619,30 @@ class Survey:
                     html.write("</ul>")
             html.write("</body></html>")
 
-    def statistics(self, answers):
+    def statistics(self, answers, exclude=None):
         """Do some simple statistics of the answers.
 
+        Forms which were scanned twice are counted only once.
+
         Parameters
         ----------
         answers: List of answers to each question for each form.
+        exclude: Indices of forms which are not counted. Defaults to
+            `duplicates`, which are searched first if necessary, see
+            `find_duplicates`.
 
         Returns
         -------
         list
             A list of tuples containing the title of the questions and the
-            number of each possible answer.
+            number of each possible answer, see `count_answers`.
         """
 
-        data = []
+        if exclude is None:
+            if self.duplicates is None:
+                self.find_duplicates()
+            exclude = self.duplicates
 
-        for i, q in enumerate(self.questions):
-            ans_counter = {answer: 0 for answer in q.answers}
-            ans_counter[""] = 0  # no answer
-            ans = [a.strip() for form in answers for a in form[i].split(',')]
-            ans_counter.update(dict(Counter(ans)))
-            data.append((q.title, ans_counter))
+        answers = [form for k, form in enumerate(answers) if k not in exclude]
 
-        return data
+        return count_answers(self.questions, answers)